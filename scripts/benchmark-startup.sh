@@ -0,0 +1,13 @@
+#!/bin/bash
+# Run from the repository root, wherever the checkout lives
+cd "$(dirname "$0")/.." || exit
+
+# venv layout differs between Windows and posix
+python_bin="./venv/Scripts/python.exe"
+[ -x "$python_bin" ] || python_bin="./venv/bin/python"
+
+echo measuring batch job startup time
+# Cold start import time of every job, pass --run_action <job> to measure one
+"$python_bin" -m src.utils.startup_benchmark --repeats 5 "$@"
+
+read -p "Press enter to continue"
@@ -1,16 +1,4 @@
 #!/bin/bash
-# Set the start time
-start_time=$(date +%s)
-
-# Calculate the end time (2 hours later)
-end_time=$((start_time + 7200))
-
-echo "start_time $(date -d @$start_time)"
-echo "end_time $(date -d @$end_time)"
-
-#echo "start_time $(date -d @$start_time)" >> stock-runner.log
-#echo "end_time $(date -d @$end_time)" >> stock-runner.log
-
 echo ""
 echo "********************"
 echo "starting stock-trader"
@@ -20,25 +8,11 @@ echo ""
 # Directory where your Python script is located
 script_dir="C:/.important/projects/stock-trader"
 
-#read -p "Press enter to continue"
-
-# Loop until the current time is less than the end time
-while [[ $(date +%s) -lt $end_time ]]; do
-    # Change to the script directory
-    cd "$script_dir" || exit
-    echo running stock-trading
-    # Run your Python script
-    ./venv/Scripts/python.exe ./main.py --run_action run_trader_bot
-
-    echo ""
-    echo "--------------------"
-    echo "Pausing for 1 minute"
-    echo "--------------------"
-    echo ""
+cd "$script_dir" || exit
 
-    # Sleep for 1 minute before running again
-    sleep 60
-done
+# One resident process runs the trader bot every minute of market hours for 2 hours, keeping its database
+# connections, models and bar caches warm between runs instead of starting a new process each minute
+./venv/Scripts/python.exe ./main.py --run_action run_trader_bot --daemon --interval_seconds 60 --max_runtime_minutes 120
 
 echo ""
 echo "********************"
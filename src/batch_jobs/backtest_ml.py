@@ -1,19 +1,20 @@
 # backtest_ml.py
-import operator
 from datetime import datetime
 
 from src.batch_jobs.batch_job import BatchJob
 from src.config.config_manager import ConfigManager
-from src.ml.backtester import Backtester
+from src.ml.backtest_executor import BacktestExecutor
 from src.ml.data_cleaner import clean_stock_prices
 from src.ml.feature_engineer import engineer_features_for_stock_prices
 from src.ml.label_generator import LabelGenerator
 from src.ml.ml_vars import ModelFeatures
+from src.ml.model_registry import ModelRegistry
 from src.ml.model_training import ModelTraining, get_model_data_for_insert
 from src.models.stock.custom_time_frame import CustomTimeFrame, TimeFrameEnum
+from src.models.stock.stock_price_batch import StockPriceBatch
 from src.postgres.stock_trader_db import StockTraderDb
-from src.trading.brokerages.alpaca.alpaca_utils import convert_stock_price_list_to_df, \
-    get_inserted_prediction_stock_price_id_and_tmstmp, fetch_and_prepare_data
+from src.trading.brokerages.alpaca.alpaca_utils import get_inserted_prediction_stock_price_id_and_tmstmp, \
+    fetch_and_prepare_data, prepare_data_by_symbol
 from src.utils.stock_logger import StockLogger
 from src.utils.utils import extract_symbols, generate_date_range, get_uuid_as_str, \
     chunk_and_process, get_model_name
@@ -27,7 +28,6 @@ class BacktestMl(BatchJob):
 
     ml_model = None
     label_generator = None
-    stock_trader_db = None
     timeframe = None
     alpaca_time_frame = None
     start_date = None
@@ -39,6 +39,7 @@ class BacktestMl(BatchJob):
     days_of_stock_data_to_get = None
     trainer = None
     model_to_use = None
+    data_source = None
 
     def __init__(self):
         super().__init__()
@@ -65,6 +66,9 @@ class BacktestMl(BatchJob):
 
         self.model_to_use = ConfigManager().get('trading_configs', 'model_to_use')
 
+        # 'alpaca' fetches bars through the bar cache, 'database' streams stored bars one symbol at a time
+        self.data_source = self.config.get('trading_configs', 'backtest_data_source') or 'alpaca'
+
     def run(self):
         try:
             run_id = self.stock_trader_db.run_start(process_name=self.process_name)
@@ -78,10 +82,13 @@ class BacktestMl(BatchJob):
     def perform_backtest_for_stock_prices(self, symbols):
         try:
             self.logger.logger.debug("Running backtest")
-            stock_price_data = self.fetch_stock_data(symbols)
+            if self.data_source == 'database':
+                stock_price_data, labeled_data = self.stream_and_prepare_stock_data(symbols)
+            else:
+                stock_price_data = self.fetch_stock_data(symbols)
 
-            labeled_data = fetch_and_prepare_data(indicators_to_use=self.indicators_to_use,
-                                                  stock_prices_list=stock_price_data,)
+                labeled_data = fetch_and_prepare_data(indicators_to_use=self.indicators_to_use,
+                                                      stock_prices_list=stock_price_data,)
 
             trainer, inserted_predictions = self.train_and_insert_model(labeled_data, stock_price_data)
 
@@ -98,16 +105,7 @@ class BacktestMl(BatchJob):
             self.logger.log_error(e, "Error performing backtest", True)
 
     def fetch_stock_data(self, symbols):
-
-        internal_stock_price_data = self.stock_trader_db.get_stock_prices(symbols=symbols,
-                                                                          timeframe_unit=self.timeframe.unit,
-                                                                          start_date=str(self.start_date),
-                                                                          end_date=str(self.end_date))
-        self.logger.logger.debug(f"len(internal_stock_price_data): {len(internal_stock_price_data)}")
-        if len(internal_stock_price_data) > 0:
-            self.logger.logger.debug(f"successfully fetched internal stock data")
-            # return internal_stock_price_data
-
+        # served from the local bar cache, only missing ranges go out to alpaca
         stock_price_data = self.alpaca_stock_data.get_stock_data(symbols=symbols, timeframe=self.alpaca_time_frame,
                                                                  start_date=self.start_date,
                                                                  end_date=self.end_date)
@@ -115,6 +113,27 @@ class BacktestMl(BatchJob):
 
         return stock_price_data
 
+    def stream_and_prepare_stock_data(self, symbols):
+        """
+        Streams stored bars from the database and prepares features per symbol as they arrive. Only the compact
+        columnar batches are kept for the later insert and prediction steps.
+        """
+        symbol_batches = []
+
+        def collect_symbol_batches():
+            stock_price_stream = self.stock_trader_db.stream_stock_prices(symbols=symbols,
+                                                                          timeframe_unit=self.timeframe.unit,
+                                                                          start_date=str(self.start_date),
+                                                                          end_date=str(self.end_date))
+            for symbol, symbol_batch in stock_price_stream:
+                symbol_batches.append(symbol_batch)
+                yield symbol_batch
+
+        labeled_data = list(prepare_data_by_symbol(self.indicators_to_use, collect_symbol_batches()))
+        self.logger.logger.debug(f"successfully streamed stock data for {len(symbol_batches)} symbols")
+
+        return StockPriceBatch.concat(symbol_batches), labeled_data
+
     def train_and_insert_model(self, labeled_stock_data, stock_price_data):
         model_data = self.fetch_ml_model()
         if model_data:
@@ -139,7 +158,7 @@ class BacktestMl(BatchJob):
 
         trainer.evaluate_model()
         self.logger.logger.debug(f"accuracy_score: {trainer.accuracy_score}")
-        self.logger.logger.debug(f"classification_report: {trainer.classification_report}")
+        self.logger.lazy.debug("classification_report: {}", lambda: trainer.classification_report)
 
         self.trainer.id = self.insert_ml_model(trainer)[0][0]
         self.logger.logger.debug(f"successfully inserted model {self.trainer.id}")
@@ -150,12 +169,8 @@ class BacktestMl(BatchJob):
 
     def execute_backtest(self, labeled_stock_df, model):
         results = []
-        for labeled_stock in labeled_stock_df:
-            symbol = labeled_stock['symbol'].iloc[0]
-
-            backtester = Backtester(labeled_stock, symbol, self.model_features, model)
-            backtest_results = backtester.run_backtest()
-
+        symbol_results = BacktestExecutor(self.model_features, model).run(labeled_stock_df)
+        for symbol, backtest_results in symbol_results.items():
             backtest_results['symbol'] = symbol
             backtest_results['start_date'] = str(self.start_date)
             backtest_results['end_date'] = str(self.end_date)
@@ -167,26 +182,21 @@ class BacktestMl(BatchJob):
     def insert_stock_prices(self, stock_price_data, labeled_stock_data, inserted_predictions):
 
         try:
-            stock_price_dicts = [stock_price.to_dict() for stock_price in stock_price_data]
-            inserted_stock_prices = self.stock_trader_db.insert_stock_prices(
-                stock_prices=stock_price_dicts
-            )
-            self.logger.logger.debug(f"inserted_stock_prices: {len(inserted_stock_prices)}")
-
-            inserted_stock_prices.sort(key=operator.itemgetter(0))
+            inserted_stock_prices = self.stock_trader_db.insert_stock_prices(stock_prices=stock_price_data)
+            self.logger.debug_hot_path("inserted_stock_prices: {}", inserted_stock_prices)
 
             predictions_list = get_inserted_prediction_stock_price_id_and_tmstmp(inserted_predictions)
 
             # Create a mapping of symbols to their labeled data for efficient lookup
             labels_to_insert = []
             # self.logger.logger.debug(f"labeled_stock_data: {labeled_stock_data}")
-            self.logger.logger.debug(f"labeled_stock_data[0]: {labeled_stock_data[0]}")
+            self.logger.debug_hot_path("labeled_stock_data[0]: {}", lambda: labeled_stock_data[0])
             for labeled_data in labeled_stock_data:
                 for row in labeled_data.values:
                     for prediction in predictions_list:
                         p_timestamp, p_stock_price_id, p_symbol = prediction
 
-                        l_timestamp = row[2]
+                        l_timestamp = str(row[2])
                         l_symbol = row[1]
                         l_stock_price_id = row[0]
 
@@ -226,7 +236,7 @@ class BacktestMl(BatchJob):
 
     def insert_predictions(self, predictions):
         self.logger.logger.debug(f"inserting predictions: {len(predictions)}")
-        self.logger.logger.debug(f"predictions: {predictions[:2]}")
+        self.logger.debug_hot_path("predictions: {}", lambda: predictions[:2])
         inserted_predictions = self.stock_trader_db.insert(predictions=predictions,
                                                            proc_name="machine_learning.insert_predictions")
         self.logger.logger.debug(f"inserted predictions: {len(inserted_predictions)}")
@@ -237,6 +247,6 @@ class BacktestMl(BatchJob):
 
     def fetch_ml_model(self):
         model_name = get_model_name(self.model_to_use, self.indicators_to_use)
-        model_data = self.stock_trader_db.get_model(model_name=model_name)
-        self.logger.logger.debug(f"model: {model_data}")
+        model_data = ModelRegistry().get(model_name)
+        self.logger.lazy.debug("model: {}", lambda: model_data)
         return model_data
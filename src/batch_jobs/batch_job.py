@@ -1,17 +1,48 @@
 from src.config.config_manager import ConfigManager
-from src.postgres.stock_trader_db import StockTraderDb
-from src.trading.brokerages.alpaca.alpaca_manager import AlpacaManager
 from src.utils.stock_logger import StockLogger
 
 
 class BatchJob:
+    """
+    Base class of the jobs BatchRunner runs. The database and alpaca services are created, and their modules
+    imported, on first use, so a job only pays for the services it touches.
+    """
+    _stock_trader_db = None
+    _alpaca_stock_data = None
+
     def __init__(self):
         self.logger = StockLogger(self.__class__.__name__)
         # services
         self.config_manager = ConfigManager()
-        self.stock_trader_db = StockTraderDb()
-        self.alpaca_stock_data = AlpacaManager().get_stock_data()
 
+    @property
+    def stock_trader_db(self):
+        if self._stock_trader_db is None:
+            from src.postgres.stock_trader_db import StockTraderDb
+            self._stock_trader_db = StockTraderDb()
+        return self._stock_trader_db
+
+    @stock_trader_db.setter
+    def stock_trader_db(self, stock_trader_db):
+        self._stock_trader_db = stock_trader_db
+
+    @property
+    def alpaca_stock_data(self):
+        if self._alpaca_stock_data is None:
+            from src.trading.brokerages.alpaca.alpaca_manager import AlpacaManager
+            self._alpaca_stock_data = AlpacaManager().get_stock_data()
+        return self._alpaca_stock_data
+
+    @alpaca_stock_data.setter
+    def alpaca_stock_data(self, alpaca_stock_data):
+        self._alpaca_stock_data = alpaca_stock_data
+
+    def refresh(self):
+        """
+        Called by a daemon BatchRunner before every run after the first, to reset state that must not carry over
+        between runs. Clients, pools and caches that are safe to reuse should be kept.
+        """
+        pass
 
     def run(self):
         raise NotImplementedError("Subclasses should implement this method.")
@@ -1,17 +1,26 @@
-from src.batch_jobs.backtest_ml import BacktestMl
-from src.batch_jobs.build_daily_watchlist import BuildDailyWatchlist
-from src.batch_jobs.data_tester import DataTester
-from src.batch_jobs.download_stock_data import DownloadStockData
-from src.batch_jobs.insert_tickers import InsertTickers
-from src.batch_jobs.run_trader_bot import RunTraderBot
-from src.batch_jobs.update_account_balance import UpdateAccountBalance
+import importlib
 
+# run_action -> 'module:Class', a job's module (and everything it imports) is only loaded when that job runs
 global_batch_job_map = {
-    'download_stock_data': DownloadStockData,
-    'run_trader_bot': RunTraderBot,
-    'update_account_balance': UpdateAccountBalance,
-    'insert_tickers': InsertTickers,
-    'build_daily_watchlist': BuildDailyWatchlist,
-    'data_tester': DataTester,
-    'backtest_ml': BacktestMl
+    'download_stock_data': 'src.batch_jobs.download_stock_data:DownloadStockData',
+    'run_trader_bot': 'src.batch_jobs.run_trader_bot:RunTraderBot',
+    'update_account_balance': 'src.batch_jobs.update_account_balance:UpdateAccountBalance',
+    'insert_tickers': 'src.batch_jobs.insert_tickers:InsertTickers',
+    'build_daily_watchlist': 'src.batch_jobs.build_daily_watchlist:BuildDailyWatchlist',
+    'data_tester': 'src.batch_jobs.data_tester:DataTester',
+    'backtest_ml': 'src.batch_jobs.backtest_ml:BacktestMl',
+    'parameter_sweep': 'src.batch_jobs.parameter_sweep:RunParameterSweep'
 }
+
+
+def get_batch_job_class(run_action, batch_job_map=None):
+    """
+    Imports and returns the job class registered for run_action.
+
+    :return: The BatchJob subclass, or None when run_action is not registered.
+    """
+    job_path = (batch_job_map or global_batch_job_map).get(run_action)
+    if job_path is None:
+        return None
+    module_name, class_name = job_path.split(':')
+    return getattr(importlib.import_module(module_name), class_name)
@@ -1,6 +1,11 @@
+import signal
+import sys
+import threading
+import time
+
 from src.batch_jobs.batch_job import BatchJob
-from src.batch_jobs.batch_jobs_maps import global_batch_job_map
-from src.postgres.database_service import DatabaseService
+from src.batch_jobs.batch_jobs_maps import global_batch_job_map, get_batch_job_class
+from src.constants import global_daemon_market_hours_only, global_daemon_tick_metrics_window
 from src.utils.stock_logger import StockLogger
 
 
@@ -11,22 +16,109 @@ class BatchRunner(BatchJob):
         super().__init__()
         self.run_action = self.config_manager.get_run_action()
         self.batch_job_map = global_batch_job_map
+        self.daemon, self.interval_seconds, self.max_runtime_minutes = self.config_manager.get_daemon_settings()
+        # created by run_daemon, a single run has no ticks to measure
+        self.tick_metrics = None
+        self._stop_event = threading.Event()
 
     def run(self):
         try:
-            batch_job_class = self.batch_job_map.get(self.run_action)
+            batch_job_class = get_batch_job_class(self.run_action, self.batch_job_map)
             if batch_job_class:
                 self.logger.log_process(self.run_action, 'start')
 
-                DatabaseService().connect()
-
                 job = batch_job_class()
-                job.run()
+                try:
+                    if self.daemon:
+                        self.run_daemon(job)
+                    else:
+                        job.run()
+                finally:
+                    # only a job that used the database imported it, importing it here would load psycopg2 for nothing
+                    database_service = sys.modules.get('src.postgres.database_service')
+                    if database_service is not None and database_service.DatabaseService._instance is not None:
+                        database_service.DatabaseService().disconnect()
 
-                DatabaseService().disconnect()
+                if job._stock_trader_db is not None:
+                    self.logger.logger.debug(f"reference data cache: {job.stock_trader_db.cache.stats()}")
 
                 self.logger.log_process(self.run_action, 'stop')
             else:
                 self.logger.log_error(f"Invalid action: {self.run_action}", True)
         except Exception as e:
             self.logger.log_error(e, f"Error running batch job {self.run_action}", True)
+
+    def run_daemon(self, job):
+        """
+        Runs the job every interval_seconds in this process until max_runtime_minutes have passed or the process is
+        told to stop. The job instance, database pool, models and bar caches stay warm between ticks. Ticks are
+        aligned to the interval, a tick that overruns skips the ticks it missed instead of queueing them, and with
+        global_daemon_market_hours_only the daemon sleeps through closed market hours.
+        """
+        from src.utils.tick_metrics import TickMetrics
+
+        self.tick_metrics = TickMetrics(global_daemon_tick_metrics_window, self.interval_seconds)
+        self._install_signal_handlers()
+        deadline = time.monotonic() + self.max_runtime_minutes * 60
+        next_tick = time.monotonic()
+        first_tick = True
+        self.logger.logger.info(f"running {self.run_action} every {self.interval_seconds}s "
+                                f"for up to {self.max_runtime_minutes} minutes")
+
+        while not self._stop_event.is_set() and time.monotonic() < deadline:
+            seconds_to_open = self._seconds_until_market_open()
+            if seconds_to_open > 0:
+                self.logger.logger.info(f"market closed, sleeping {seconds_to_open:.0f}s until the next session")
+                self._stop_event.wait(min(seconds_to_open, max(deadline - time.monotonic(), 0)))
+                next_tick = time.monotonic()
+                continue
+
+            if not first_tick:
+                job.refresh()
+            first_tick = False
+            self._tick(job)
+
+            next_tick += self.interval_seconds
+            now = time.monotonic()
+            if next_tick < now:
+                skipped = int((now - next_tick) // self.interval_seconds) + 1
+                next_tick += skipped * self.interval_seconds
+                self.logger.logger.warning(f"tick overran the {self.interval_seconds}s interval, skipped {skipped}")
+            self._stop_event.wait(max(min(next_tick, deadline) - now, 0))
+
+        self.logger.logger.info(f"daemon stopped, tick metrics: {self.tick_metrics.summary()}")
+
+    def _tick(self, job):
+        start_time = time.perf_counter()
+        success = True
+        try:
+            job.run()
+        except Exception as e:
+            success = False
+            self.logger.log_error(e, f"Error in {self.run_action} tick", True)
+        self.tick_metrics.record(time.perf_counter() - start_time, success)
+        self.logger.logger.info(f"tick metrics: {self.tick_metrics.summary()}")
+
+    def _seconds_until_market_open(self):
+        """
+        :return: 0 while the market is open or when ticking is not limited to market hours, otherwise the seconds
+            until the next session opens.
+        """
+        if not global_daemon_market_hours_only:
+            return 0
+        import pandas as pd
+        from src.utils.utils import get_market_session
+
+        now = pd.Timestamp.now(tz='UTC')
+        session = get_market_session(now)
+        if session is None:
+            return self.interval_seconds
+        market_open, _ = session
+        return max((market_open - now).total_seconds(), 0)
+
+    def _install_signal_handlers(self):
+        # signal handlers can only be set from the main thread
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_number, lambda signum, frame: self._stop_event.set())
@@ -40,7 +40,7 @@ class BuildDailyWatchlist(BatchJob):
 
                 # not enough data to analyze
                 if len(df) < 20:
-                    self.logger.logger.debug(f"symbol: {symbol} has less than 20 rows, skipping")
+                    self.logger.debug_hot_path("symbol: {} has less than 20 rows, skipping", symbol)
                     continue
 
                 stock_analysis = StockAnalysis(df, ['bb'])
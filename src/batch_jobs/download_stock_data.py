@@ -38,17 +38,15 @@ class DownloadStockData(BatchJob):
             stock_price_data = self.alpaca_stock_data.get_stock_data(symbols=symbols, timeframe=self.timeframe,
                                                                      start_date=self.start_date, end_date=self.end_date)
 
-            self.logger.logger.debug(f"Successfully fetched data for: {len(stock_price_data)} tickers")
+            self.logger.logger.debug(f"Successfully fetched data for: {len(stock_price_data)} stock prices")
 
-            if not stock_price_data or len(stock_price_data) == 0:
+            if len(stock_price_data) == 0:
                 self.logger.logger.debug(f"No stock prices found for tickers: {symbols}")
                 return
 
-            stock_prices = [stock_price.to_dict() for stock_price in stock_price_data]
-
-            self.logger.logger.debug(f"Beginning to load: {len(stock_prices)} stock prices")
-            self.stock_trader_db.insert_stock_prices(stock_prices)
-            self.logger.logger.debug(f"Successfully loaded: {len(stock_prices)} stock prices")
+            self.logger.logger.debug(f"Beginning to load: {len(stock_price_data)} stock prices")
+            self.stock_trader_db.insert_stock_prices(stock_price_data)
+            self.logger.logger.debug(f"Successfully loaded: {len(stock_price_data)} stock prices")
 
         except Exception as e:
             self.logger.log_error(e, f"Error getting stock data from alpaca and inserting into db: {e}", False)
@@ -0,0 +1,53 @@
+# parameter_sweep.py
+from src.batch_jobs.batch_job import BatchJob
+from src.constants import global_parameter_sweep_grid
+from src.ml.parameter_sweep import ParameterSweep
+from src.models.stock.custom_time_frame import CustomTimeFrame, TimeFrameEnum
+from src.trading.brokerages.alpaca.alpaca_utils import convert_stock_price_list_to_df
+from src.utils.stock_logger import StockLogger
+from src.utils.utils import extract_symbols, generate_date_range
+
+
+class RunParameterSweep(BatchJob):
+    logger = StockLogger('RunParameterSweep')
+
+    process_name = "parameter_sweep"
+
+    indicators_to_use = None
+    grid = None
+    timeframe = None
+    alpaca_time_frame = None
+    start_date = None
+    end_date = None
+
+    def __init__(self):
+        super().__init__()
+        self.indicators_to_use = self.config_manager.get('trading_configs', 'indicators_to_use')
+        self.grid = self.config_manager.get('trading_configs', 'parameter_sweep_grid') or global_parameter_sweep_grid
+
+        days_of_stock_data_to_get = int(self.config_manager.get('trading_configs', 'days_of_stock_data_to_get'))
+        self.timeframe = CustomTimeFrame.get_time_frame_from_enum(TimeFrameEnum.ONE_MINUTE)
+        self.alpaca_time_frame = self.timeframe.convert_to_alpaca_timeframe()
+        self.start_date, self.end_date = generate_date_range(days_of_stock_data_to_get)
+
+    def run(self):
+        try:
+            run_id = self.stock_trader_db.run_start(process_name=self.process_name)
+            tickers = self.stock_trader_db.get_stocks_to_watch_w_filter(filter_code='penny_stocks')
+            symbols = extract_symbols(tickers)
+
+            # the bars are fetched once and shared by every grid point
+            stock_price_data = self.alpaca_stock_data.get_stock_data(symbols=symbols,
+                                                                     timeframe=self.alpaca_time_frame,
+                                                                     start_date=self.start_date,
+                                                                     end_date=self.end_date)
+            stock_price_dfs = convert_stock_price_list_to_df(stock_price_data)
+
+            results_df = ParameterSweep(stock_price_dfs, self.indicators_to_use, self.grid).run()
+            results_path = ParameterSweep.write_results(results_df)
+            self.logger.logger.info(f"wrote {len(results_df)} sweep results to {results_path}")
+            self.logger.logger.info(f"best parameters: {results_df.iloc[0].to_dict() if len(results_df) else None}")
+
+            self.stock_trader_db.run_stop(run_id=run_id)
+        except Exception as e:
+            self.logger.log_error(e, "Error running RunParameterSweep", True)
@@ -3,20 +3,21 @@ import base64
 import json
 import pickle
 
-import pandas as pd
-
 from src.batch_jobs.batch_job import BatchJob
 from src.config.config_manager import ConfigManager
 from src.constants import global_sell_signals, global_paper_trading
 from src.ml.data_cleaner import clean_stock_prices
 from src.ml.feature_engineer import engineer_features_for_stock_prices
 from src.ml.label_generator import LabelGenerator
+from src.ml.model_registry import ModelRegistry
+from src.ml.model_scorer import ModelScorer
 from src.ml.model_training import ModelTraining, get_model_data_for_insert
 from src.models.stock.custom_time_frame import CustomTimeFrame, TimeFrameEnum
 from src.models.stock.stock_analysis import StockAnalysis
+from src.models.stock.streaming_indicators import StreamingIndicators
 from src.trading.brokerages.alpaca.alpaca_manager import AlpacaManager
 from src.trading.brokerages.alpaca.alpaca_utils import convert_stock_price_list_to_df, calculate_atr, \
-    fetch_and_prepare_data
+    fetch_and_prepare_data, prepare_features
 from src.utils.utils import generate_date_range, extract_symbols, get_model_name
 
 
@@ -25,6 +26,8 @@ class RunTraderBot(BatchJob):
     model = None
     model_version = None
     model_id = None
+    streaming_indicators = None
+    model_scorer = None
 
     def __init__(self, indicators_to_use=None):
         super().__init__()
@@ -43,6 +46,13 @@ class RunTraderBot(BatchJob):
 
         self.process_name = 'run_trader_bot'
 
+        self.streaming_indicators = {}
+
+    def refresh(self):
+        # positions and balance change between runs, the date range moves with the trading day
+        self.alpaca_bot.refresh()
+        self.start_date, self.end_date = generate_date_range(30)
+
     def run(self):
         run_id = None
         try:
@@ -63,6 +73,12 @@ class RunTraderBot(BatchJob):
             self.model_id = model_data['id']
             self.logger.logger.debug(f"successfully fetched model")
             self.model = model_data['model']
+            if ModelScorer.can_score(model_data):
+                self.model_scorer = ModelScorer.from_model_data(model_data)
+            else:
+                # stored before scalers were saved with the model, keep refitting on each symbol's data
+                self.logger.logger.warning(f"model {self.model_version} has no stored scaler, falling back to training")
+                self.model_scorer = None
 
         model_training = None
         market_order = None
@@ -109,6 +125,10 @@ class RunTraderBot(BatchJob):
                     self.logger.logger.debug(f"selling stock: {symbol}")
                     market_order = self.alpaca_bot.sell(position)
 
+            if market_order is None:
+                # the model did not sell, the rule based exit on the streaming indicators still can
+                market_order = self.sell(position)
+
         if model_training is not None:
             self.insert_ml_model(model_training)
 
@@ -141,10 +161,10 @@ class RunTraderBot(BatchJob):
         Uses the ML model to make a trading decision for the given symbol.
         """
         # Fetch and prepare data
-        self.logger.logger.debug(f"Making trading decision for {symbol}")
+        self.logger.debug_hot_path("Making trading decision for {}", symbol)
 
         predictions = self.fetch_predictions_for_symbol(symbol)
-        self.logger.logger.debug(f"predictions: {predictions}")
+        self.logger.debug_hot_path("predictions: {}", lambda: predictions)
         if predictions:
             latest_prediction = predictions[0]  # Assuming the first one is the latest
             prediction_value = latest_prediction[2]  # Adjust index based on your data structure
@@ -153,6 +173,10 @@ class RunTraderBot(BatchJob):
 
         stock_price = self.alpaca_stock_data.get_stock_data(symbols=symbol, timeframe=self.timeframe,
                                                             start_date=self.start_date)
+        if self.model_scorer is not None:
+            return self.score_latest(indicators_to_use, stock_price), None
+
+        # no stored model yet, train one on this symbol's data
         data_for_prediction = fetch_and_prepare_data(indicators_to_use, stock_price)
         prediction = 'hold'
         model_training = None
@@ -168,10 +192,20 @@ class RunTraderBot(BatchJob):
             model_training.evaluate_model()
             prediction = model_training.predictions[0]
 
-        self.logger.logger.debug(f"prediction: {prediction}")
+        self.logger.debug_hot_path("prediction: {}", prediction)
 
         return prediction, model_training
 
+    def score_latest(self, indicators_to_use, stock_price):
+        """
+        Scores the latest bar with the stored model and scaler, without labeling or refitting.
+        """
+        prediction = 'hold'
+        for df in prepare_features(indicators_to_use, stock_price):
+            prediction, probability = self.model_scorer.score_latest(df)
+            self.logger.debug_hot_path("prediction: {}, probability: {}", prediction, probability)
+        return prediction
+
     def insert_ml_model(self, trainer):
         model_data = get_model_data_for_insert(trainer, self.indicators_to_use)
         return self.stock_trader_db.insert(ml_model=model_data, proc_name="machine_learning.insert_model")
@@ -185,12 +219,13 @@ class RunTraderBot(BatchJob):
 
     def buy(self):
         stocks_to_watch = self.stock_trader_db.get_watchlist()
-        self.logger.logger.debug(f"stocks_to_watch: {json.dumps(stocks_to_watch, indent=4, sort_keys=True)}")
+        self.logger.debug_hot_path("stocks_to_watch: {}",
+                                   lambda: json.dumps(stocks_to_watch, indent=4, sort_keys=True))
 
         for stock in stocks_to_watch:
             quote = self.alpaca_bot.get_quote_for_symbol(stock.symbol)
-            self.logger.logger.debug(f"quote.ask_price: {quote.ask_price}")
-            self.logger.logger.debug(f"stock.target_buy_price: {stock.target_buy_price}")
+            self.logger.debug_hot_path("quote.ask_price: {}", quote.ask_price)
+            self.logger.debug_hot_path("stock.target_buy_price: {}", stock.target_buy_price)
 
             # todo refine this to make it more accurate
             if quote.ask_price <= stock.target_buy_price:
@@ -199,24 +234,27 @@ class RunTraderBot(BatchJob):
                 break
 
     def sell(self, position):
+        """
+        Rule based exit: sells on a sell signal from the streaming indicators or once the bid drops to the sell price.
+
+        :return: The market order, or None when holding.
+        """
         self.logger.logger.debug("determining if we should sell...")
 
         open_orders = self.alpaca_bot.get_open_orders()
         for order in open_orders:
             if order.symbol == position.symbol:
                 self.logger.logger.debug("already have a sell order placed, skipping...")
-                return
+                return None
 
-        alpaca_timeframe = self.timeframe.convert_to_alpaca_timeframe()
-
-        # get stock price data
-        stock_price = self.alpaca_stock_data.get_stock_data(symbols=position.symbol, timeframe=alpaca_timeframe,
+        # get stock price data, self.timeframe is already an alpaca TimeFrame
+        stock_price = self.alpaca_stock_data.get_stock_data(symbols=position.symbol, timeframe=self.timeframe,
                                                             start_date=self.start_date)
-        stock_price_data = [stock_price.to_dict() for stock_price in stock_price]
-        df = pd.DataFrame(stock_price_data)
+        df = stock_price.to_frame()
 
         # determine trade signal
-        stock_analysis = StockAnalysis(df, self.indicators_to_use)
+        indicators = self.get_streaming_indicators(position.symbol, df)
+        stock_analysis = StockAnalysis(df, self.indicators_to_use, indicators=indicators)
         trade_signal, target_buy_price, target_sell_price = stock_analysis.analyze()
 
         # get this for default sell price
@@ -232,9 +270,26 @@ class RunTraderBot(BatchJob):
 
         if trade_signal in global_sell_signals or quote.bid_price <= sell_price:
             self.logger.logger.debug(f"selling stock: {position.symbol}")
-            self.alpaca_bot.sell(position)
-        else:
-            self.logger.logger.debug("holding stock...")
+            return self.alpaca_bot.sell(position)
+        self.logger.logger.debug("holding stock...")
+        return None
+
+    def get_streaming_indicators(self, symbol, df):
+        """
+        Brings the symbol's streaming indicators up to date with the bars in df, only bars newer than the last one
+        seen are applied. State is saved after every update so a restarted bot resumes where it left off.
+
+        Read by the rule based exit in sell, which use_ml_model runs for an open position the model does not sell.
+        The model's own features come from prepare_features, see StreamingIndicators.
+        """
+        indicators = self.streaming_indicators.get(symbol) or StreamingIndicators.load(symbol) or \
+            StreamingIndicators()
+        applied_bars = indicators.update_from_frame(df)
+        self.logger.debug_hot_path("applied {} new bars to {} streaming indicators", applied_bars, symbol)
+        if applied_bars:
+            indicators.save(symbol)
+        self.streaming_indicators[symbol] = indicators
+        return indicators
 
     def get_default_sell_price(self, position, target_sell_price):
         try:
@@ -253,8 +308,8 @@ class RunTraderBot(BatchJob):
 
     def fetch_ml_model(self):
         model_name = get_model_name(self.model_to_use, self.indicators_to_use)
-        model_data = self.stock_trader_db.get_model(model_name=model_name)
-        self.logger.logger.debug(f"model: {model_data}")
+        model_data = ModelRegistry().get(model_name)
+        self.logger.debug_hot_path("model: {}", lambda: model_data)
         return model_data
 
     def fetch_predictions_for_symbol(self, symbol):
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.constants import global_bar_cache_dir, global_bar_cache_settle_minutes, global_use_bar_cache
+from src.utils.file_manager import relative_path, file_lock
+from src.utils.stock_logger import StockLogger
+
+bar_cache_dir = os.environ.get('STOCK_TRADER_BAR_CACHE_DIR') or global_bar_cache_dir
+use_bar_cache = global_use_bar_cache or bool(os.environ.get('STOCK_TRADER_BAR_CACHE_DIR'))
+
+bar_columns = ['open', 'high', 'low', 'close', 'volume', 'trade_count', 'vwap']
+bar_dtype = np.dtype([('timestamp', 'i8')] + [(column, 'f8') for column in bar_columns])
+
+
+def to_epoch_ns(value=None):
+    """
+    Converts a date, datetime, string or pandas Timestamp to UTC epoch nanoseconds. None means now.
+    Naive values are treated as UTC, which is how the alpaca data api reads them.
+    """
+    timestamp = pd.Timestamp.now(tz='UTC') if value is None else pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return int(timestamp.value)
+
+
+def merge_ranges(ranges):
+    """
+    Merges overlapping or touching [start, end] ranges.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class BarCache:
+    """
+    On-disk columnar store of raw bars, one structured NumPy file per symbol and timeframe.
+
+    Next to each bar file is a json file of the [start, end] ranges (epoch ns) that have already been fetched, so
+    a repeat request only needs to go to the api for the gaps. A range that ended with no bars (nights, weekends,
+    halted tickers) still counts as covered.
+
+    Bar files are read whole, not memory-mapped, since a mapped file cannot be replaced on Windows. They stay in
+    memory while the file is unchanged, so a long-running process reads each file once. Writers from different
+    processes take a per symbol file lock, so concurrent merges of the same symbol cannot drop each other's bars or
+    coverage.
+    """
+    logger = StockLogger("BarCache")
+
+    def __init__(self, cache_dir=bar_cache_dir, settle_minutes=global_bar_cache_settle_minutes):
+        self.cache_dir = os.path.join(relative_path, cache_dir)
+        # bars this close to now may still be revised or not yet published, so they are never marked covered
+        self.settle_ns = int(settle_minutes * 60 * 1e9)
+        self._lock = threading.Lock()
+        # bars_path -> (file version, bars), reloaded when another process rewrites the file
+        self._memory = {}
+
+    def _paths(self, symbol, timeframe_key):
+        timeframe_dir = os.path.join(self.cache_dir, timeframe_key)
+        return os.path.join(timeframe_dir, f"{symbol}.npy"), os.path.join(timeframe_dir, f"{symbol}.json")
+
+    @staticmethod
+    def _lock_path(bars_path):
+        return f"{bars_path[:-len('.npy')]}.lock"
+
+    def get_coverage(self, symbol, timeframe_key):
+        _, coverage_path = self._paths(symbol, timeframe_key)
+        try:
+            with open(coverage_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return []
+
+    def missing_ranges(self, symbol, timeframe_key, start_ns, end_ns):
+        """
+        Returns the parts of [start_ns, end_ns] that are not yet covered for the symbol.
+        """
+        missing = []
+        cursor = start_ns
+        for covered_start, covered_end in self.get_coverage(symbol, timeframe_key):
+            if covered_end < cursor:
+                continue
+            if covered_start > end_ns:
+                break
+            if covered_start > cursor:
+                missing.append((cursor, covered_start - 1))
+            cursor = max(cursor, covered_end + 1)
+        if cursor <= end_ns:
+            missing.append((cursor, end_ns))
+        return missing
+
+    def write(self, symbol, timeframe_key, bars_df, start_ns, end_ns):
+        """
+        Merges freshly fetched bars into the store and marks [start_ns, end_ns] as covered.
+
+        :param bars_df: DataFrame of alpaca bars indexed by (symbol, timestamp). May be empty.
+        """
+        bars_path, coverage_path = self._paths(symbol, timeframe_key)
+        new_bars = self._to_structured(bars_df)
+
+        with self._lock, file_lock(self._lock_path(bars_path)):
+            if len(new_bars) > 0:
+                existing_bars = self._load_cached(bars_path)
+                if existing_bars is not None and len(existing_bars) > 0:
+                    # new bars first so np.unique keeps them over stale copies of the same timestamp
+                    combined = np.concatenate([new_bars, existing_bars])
+                    _, first_index = np.unique(combined['timestamp'], return_index=True)
+                    new_bars = combined[first_index]
+                self._atomic_write(bars_path, lambda f: np.save(f, new_bars))
+                self._remember(bars_path, new_bars)
+
+            settled_end_ns = min(end_ns, to_epoch_ns() - self.settle_ns)
+            if settled_end_ns >= start_ns:
+                coverage = merge_ranges(self.get_coverage(symbol, timeframe_key) + [[start_ns, settled_end_ns]])
+                self._atomic_write(coverage_path, lambda f: f.write(json.dumps(coverage).encode('utf-8')))
+
+    def read(self, symbol, timeframe_key, start_ns, end_ns):
+        """
+        Reads cached bars for the symbol in [start_ns, end_ns].
+
+        :return: DataFrame shaped like an alpaca BarSet frame, or None when nothing is cached in the range.
+        """
+        bars_path, _ = self._paths(symbol, timeframe_key)
+        bars = self._load_cached(bars_path)
+        if bars is None:
+            return None
+
+        timestamps = bars['timestamp']
+        start_index = np.searchsorted(timestamps, start_ns, side='left')
+        end_index = np.searchsorted(timestamps, end_ns, side='right')
+        if start_index >= end_index:
+            return None
+
+        window = bars[start_index:end_index]
+        index = pd.MultiIndex.from_arrays(
+            [np.full(len(window), symbol, dtype=object), pd.to_datetime(window['timestamp'], utc=True)],
+            names=['symbol', 'timestamp'])
+        return pd.DataFrame({column: np.array(window[column]) for column in bar_columns}, index=index)
+
+    @staticmethod
+    def _file_version(path):
+        # every write replaces the file, so the inode changes even when the mtime resolution is coarse
+        file_stat = os.stat(path)
+        return file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size
+
+    def _load_cached(self, bars_path):
+        try:
+            version = self._file_version(bars_path)
+        except FileNotFoundError:
+            self._memory.pop(bars_path, None)
+            return None
+        cached = self._memory.get(bars_path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        bars = self._load(bars_path)
+        if bars is not None:
+            self._memory[bars_path] = (version, bars)
+        return bars
+
+    def _remember(self, bars_path, bars):
+        try:
+            self._memory[bars_path] = (self._file_version(bars_path), bars)
+        except FileNotFoundError:
+            self._memory.pop(bars_path, None)
+
+    @staticmethod
+    def _load(bars_path):
+        try:
+            return np.load(bars_path)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _atomic_write(path, write_function):
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            write_function(f)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _to_structured(bars_df):
+        bars = np.empty(len(bars_df), dtype=bar_dtype)
+        if len(bars_df) == 0:
+            return bars
+        timestamps = pd.DatetimeIndex(bars_df.index.get_level_values('timestamp'))
+        if timestamps.tz is None:
+            timestamps = timestamps.tz_localize('UTC')
+        bars['timestamp'] = timestamps.as_unit('ns').asi8
+        for column in bar_columns:
+            bars[column] = bars_df[column].to_numpy(dtype='f8')
+        return np.sort(bars, order='timestamp')
@@ -0,0 +1,118 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(value):
+    """
+    Turns call arguments into a hashable cache key, lists and dictionaries are converted to tuples.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, make_key(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(make_key(item) for item in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+class TtlLruCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after a per-entry TTL.
+
+    Keys are (namespace, key) pairs so all entries of one namespace, e.g. one getter, can be invalidated together.
+
+    :param max_size: Maximum number of entries, the least recently used entry is evicted past this.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        """
+        :return: (found, value)
+        """
+        with self._lock:
+            entry = self.entries.get((namespace, key))
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[(namespace, key)]
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end((namespace, key))
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, namespace, key, value, ttl):
+        with self._lock:
+            self.entries[(namespace, key)] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end((namespace, key))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *namespaces):
+        """
+        Drops every entry of the given namespaces, or the whole cache when none are given.
+        """
+        with self._lock:
+            if not namespaces:
+                self.entries.clear()
+                return
+            for entry_key in [entry_key for entry_key in self.entries if entry_key[0] in namespaces]:
+                del self.entries[entry_key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+def cached(ttl):
+    """
+    Method decorator that reads through the instance's TtlLruCache, found on self.cache. Results are shared between
+    callers, so they should be treated as read only. None results are not cached.
+
+    :param ttl: Seconds a result stays valid.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = make_key((args, kwargs))
+            found, value = self.cache.get(func.__name__, key)
+            if found:
+                return value
+            value = func(self, *args, **kwargs)
+            if value is not None:
+                self.cache.set(func.__name__, key, value, ttl)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def invalidates(*namespaces):
+    """
+    Method decorator that drops the given cached namespaces from self.cache once the method has run.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                self.cache.invalidate(*namespaces)
+
+        return wrapper
+
+    return decorator
@@ -37,6 +37,9 @@ class ConfigManager:
     def get_chunk_size(self):
         return self.config_service.get_chunk_size()
 
+    def get_daemon_settings(self):
+        return self.config_service.get_daemon_settings()
+
     def get_trading_configs(self):
         return self.config_service.get_trading_configs()
 
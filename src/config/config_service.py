@@ -5,7 +5,8 @@ import yaml
 
 from src.config.alpaca import AlpacaConfig
 from src.config.postgres import PostgresConfig
-from src.constants import global_chunk_size, global_days_to_get, global_paper_trading, global_live_trading
+from src.constants import global_chunk_size, global_days_to_get, global_paper_trading, global_live_trading, \
+    global_daemon_interval_seconds, global_daemon_max_runtime_minutes
 
 
 class ConfigService:
@@ -102,6 +103,12 @@ class ConfigService:
                                 help='The number of days of historical data to get', required=False)
             parser.add_argument('--chunk_size', type=int,
                                 help='The number of tickers to process at a time', required=False)
+            parser.add_argument('--daemon', action='store_true',
+                                help='Keep running and repeat the action every interval_seconds', required=False)
+            parser.add_argument('--interval_seconds', type=int,
+                                help='Seconds between runs in daemon mode', required=False)
+            parser.add_argument('--max_runtime_minutes', type=int,
+                                help='Minutes the daemon runs before exiting', required=False)
 
             self.args = parser.parse_args()
         return self.args
@@ -115,6 +122,18 @@ class ConfigService:
     def get_chunk_size(self):
         return self.get_args().chunk_size or int(self.get('misc', 'default_chunk_size') or global_chunk_size)
 
+    def get_daemon_settings(self):
+        """
+        :return: (daemon, interval_seconds, max_runtime_minutes) from the command line, falling back to misc config.
+        """
+        args = self.get_args()
+        daemon = args.daemon or bool(self.get('misc', 'daemon'))
+        interval_seconds = args.interval_seconds or int(self.get('misc', 'daemon_interval_seconds') or
+                                                        global_daemon_interval_seconds)
+        max_runtime_minutes = args.max_runtime_minutes or int(self.get('misc', 'daemon_max_runtime_minutes') or
+                                                              global_daemon_max_runtime_minutes)
+        return daemon, interval_seconds, max_runtime_minutes
+
     def get_trading_configs(self):
         return self.trading_configs
 
@@ -1,7 +1,13 @@
+from src.constants import global_db_pool_min_size, global_db_pool_max_size
+
+
 class PostgresConfig:
-    def __init__(self, user, password, host, port, dbname):
+    def __init__(self, user, password, host, port, dbname, pool_min_size=global_db_pool_min_size,
+                 pool_max_size=global_db_pool_max_size):
         self.user = user
         self.password = password
         self.host = host
         self.port = port
-        self.dbname = dbname
\ No newline at end of file
+        self.dbname = dbname
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
@@ -9,6 +9,47 @@ global_min_price = 0.10
 global_days_to_get = 30
 global_chunk_size = 100000
 
+# the number of symbols packed into a single alpaca bars request
+global_symbols_per_bar_request = 200
+
+# alpaca market data fetch pool
+global_alpaca_requests_per_minute = 200
+global_alpaca_fetch_workers = 8
+global_alpaca_max_retries = 5
+global_alpaca_retry_backoff_seconds = 1.0
+
+# local bar cache, relative to the project root unless absolute. Off by default since the project root may be read
+# only (e.g. on lambda), setting STOCK_TRADER_BAR_CACHE_DIR turns it on in that directory, e.g. /tmp/bars
+global_use_bar_cache = False
+global_bar_cache_dir = 'cache/bars'
+global_bar_cache_settle_minutes = 15
+
+# stock prices are bulk loaded with COPY into a staging table and merged into this table
+global_stock_prices_table = 'stock.stock_prices'
+# unique constraint of a bar, the merge's conflict target and the join back to stored ids
+global_stock_prices_key_columns = ['symbol', 'timeframe_unit', 'timestamp']
+
+# postgres connection pool, overridable with pool_min_size / pool_max_size in the postgres section of config.yml
+global_db_pool_min_size = 1
+global_db_pool_max_size = 10
+# pooled connections idle for longer than this are pinged before being handed out
+global_db_pool_health_check_seconds = 60
+# rows fetched per round trip by server-side cursors when streaming reads
+global_db_stream_itersize = 50000
+
+# read-through cache for reference data in StockTraderDb, ttls in seconds per getter
+global_db_cache_max_size = 256
+global_db_cache_ttls = {
+    'get_stock_filters': 3600,
+    'get_timeframes': 86400,
+    'get_trade_signals': 3600,
+    'get_watchlist': 60,
+}
+# cached getters invalidated by writes through StockTraderDb.insert, keyed by stored procedure
+global_db_cache_invalidations = {
+    'stock.insert_watchlist': ['get_watchlist'],
+}
+
 global_days_to_get_for_analysis = 30
 
 # 8 hours
@@ -18,8 +59,60 @@ global_buy_signals = ['strong_buy', 'weak_buy']
 global_sell_signals = ['strong_sell', 'weak_sell']
 
 global_indicators_window = 20
+# feature set the models are trained and scored on, stored models do not record it, so raise it only together with
+# retraining every model. 1 keeps the original quirks, the EMA column holds the SMA and BB_Upper/BB_Lower are swapped,
+# 2 computes both as named
+global_indicator_feature_version = 1
 
 global_bb_params = {'num_std_dev': 2}
 global_macd_params = {'short_window': 12, 'long_window': 26, 'signal_window': 9}
+# residual weight of the bars cut off when Indicators.latest evaluates an EWM on a tail window
+global_ewm_warmup_tolerance = 1e-8
+# rows per strided window pass in PanelIndicators, bounds the temporary window views to rows * window floats
+global_panel_chunk_rows = 250000
+# saved StreamingIndicators state, one json file per symbol
+global_streaming_indicators_state_dir = 'cache/indicators'
+
+# worker processes for per-symbol backtests, None uses every core
+global_backtest_workers = None
+
+# deserialized models kept on local disk by ModelRegistry, keyed by model id and version
+global_model_cache_dir = 'cache/models'
+
+# MarketSessionIndex: exchange calendar and the years of sessions it keeps, cached under cache/market_sessions
+global_market_calendar = 'XNYS'
+global_market_sessions_cache_dir = 'cache/market_sessions'
+global_market_sessions_years_back = 5
+global_market_sessions_years_ahead = 2
+
+# console log level and whether StockLogger.debug_hot_path messages are emitted, the STOCK_TRADER_LOG_LEVEL and
+# STOCK_TRADER_HOT_PATH_DEBUG environment variables override them. Regular debug messages stay on, only the per bar
+# and per symbol debug messages of the hot loops are gated by global_hot_path_debug
+global_log_level = 'DEBUG'
+global_hot_path_debug = False
+
+# process and trade jsonl logs start a new file per period and when one grows past max bytes
+global_jsonl_log_rotation = 'monthly'
+global_jsonl_log_max_bytes = 10 * 1024 * 1024
+
+# BatchRunner --daemon: seconds between job ticks and how long the process stays up
+global_daemon_interval_seconds = 60
+global_daemon_max_runtime_minutes = 120
+# only tick while the regular NYSE session is open, sleeping until the next open otherwise
+global_daemon_market_hours_only = True
+# recent tick durations kept for the daemon's latency summary
+global_daemon_tick_metrics_window = 500
+
+# default grid for the parameter_sweep job, overridable with trading_configs.parameter_sweep_grid
+global_parameter_sweep_grid = {
+    'window': [14, 20, 30],
+    'num_std_dev': [1.5, 2, 2.5],
+    'short_window': [12],
+    'long_window': [26],
+    'signal_window': [9],
+    'look_forward': [5, 10],
+    'threshold': [0.01, 0.03],
+}
+global_parameter_sweep_results_dir = 'results'
 
 global_numeric_columns = ['open', 'high', 'low', 'close', 'volume', 'trade_count', 'vwap']
\ No newline at end of file
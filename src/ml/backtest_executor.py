@@ -0,0 +1,87 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.constants import global_backtest_workers
+from src.ml.backtester import Backtester
+from src.utils.stock_logger import StockLogger
+
+# set once per worker process by _init_worker
+_worker_model = None
+_worker_model_features = None
+
+
+def _init_worker(model, model_features):
+    global _worker_model, _worker_model_features
+    _worker_model = model
+    _worker_model_features = model_features
+
+
+def _run_symbol_backtest(symbol, features, close, labels):
+    """
+    Rebuilds the frame Backtester needs from the compact arrays and runs it with the worker's model.
+    """
+    data = pd.DataFrame(features, columns=_worker_model_features, copy=False)
+    data['close'] = close
+    if labels is not None:
+        data['label'] = labels
+    return symbol, Backtester(data, symbol, _worker_model_features, _worker_model).run_backtest()
+
+
+def _to_task(labeled_stock, model_features, include_labels):
+    """
+    :return: (symbol, float64 feature matrix, close array, labels or None) for one symbol.
+    """
+    return (labeled_stock['symbol'].iloc[0], labeled_stock[model_features].to_numpy(dtype='float64'),
+            labeled_stock['close'].to_numpy(dtype='float64'),
+            labeled_stock['label'].to_numpy() if include_labels else None)
+
+
+class BacktestExecutor:
+    """
+    Runs per-symbol backtests on a process pool. The model is sent to each worker once through the pool
+    initializer and every task only carries its symbol's feature matrix and close prices.
+
+    :param max_workers: Number of worker processes, defaults to global_backtest_workers or every core.
+    """
+    logger = StockLogger('BacktestExecutor')
+
+    def __init__(self, model_features, model, max_workers=global_backtest_workers):
+        self.model_features = model_features
+        self.model = model
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def run(self, labeled_stock_dfs):
+        """
+        :param labeled_stock_dfs: List of per-symbol DataFrames with features, close and label columns.
+        :return: Dictionary of symbol to Backtester results, in input order.
+        """
+        include_labels = self.model is None
+        tasks = [_to_task(labeled_stock, self.model_features, include_labels)
+                 for labeled_stock in labeled_stock_dfs if len(labeled_stock) > 0]
+        if not tasks:
+            return {}
+
+        workers = min(self.max_workers, len(tasks))
+        if workers == 1:
+            return self._run_in_process(tasks)
+
+        try:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                           initargs=(self.model, self.model_features))
+        except (OSError, NotImplementedError) as e:
+            # no working multiprocessing on this platform or sandbox, e.g. no sem_open
+            self.logger.logger.warning(f"Could not start backtest processes, running in process: {e}")
+            return self._run_in_process(tasks)
+
+        self.logger.logger.debug(f"running {len(tasks)} backtests on {workers} processes")
+        with executor:
+            # a few tasks per worker and call keeps the pickling overhead low without starving the pool
+            chunksize = max(1, len(tasks) // (workers * 4))
+            results = executor.map(_run_symbol_backtest, *zip(*tasks), chunksize=chunksize)
+            return dict(results)
+
+    def _run_in_process(self, tasks):
+        _init_worker(self.model, self.model_features)
+        return dict(_run_symbol_backtest(*task) for task in tasks)
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 from src.utils.stock_logger import StockLogger
@@ -6,12 +7,10 @@ from src.utils.stock_logger import StockLogger
 class Backtester:
     logger = StockLogger()
 
-    results = {
-        'total_trades': 0,
-        'total_profit': 0.0,
-        'average_profit': 0.0
-    }
+    results = None
     prediction = None
+    # rows between a buy and its simulated sell
+    holding_period = 5
 
     def __init__(self, data, symbol, model_features, model):
         """
@@ -22,10 +21,42 @@ class Backtester:
         """
         self.data = data
         self.model = model
+        # per instance, so backtesters can run side by side
+        self.results = {
+            'total_trades': 0,
+            'total_profit': 0.0,
+            'average_profit': 0.0
+        }
         self.symbol = symbol
         self.model_features = model_features
 
     def run_backtest(self):
+        """
+        Vectorized backtest: the whole feature matrix is scored with one predict call, every row's exit is the close
+        holding_period rows later (or the last row) and P&L is summed over the buy mask. Same trades and profit as
+        run_backtest_by_row.
+        """
+        close = self.data['close'].to_numpy(dtype='float64')
+        row_count = len(close)
+        if row_count == 0:
+            return self._set_results(0, 0.0)
+
+        buy_mask = self._buy_mask()
+        exit_positions = np.minimum(np.arange(row_count) + self.holding_period, row_count - 1)
+        sell_prices = close[exit_positions]
+
+        missing_exits = buy_mask & np.isnan(sell_prices)
+        if missing_exits.any():
+            self.logger.logger.info(f"No valid sell price for {int(missing_exits.sum())} buys of {self.symbol}")
+        buy_mask &= ~missing_exits
+
+        total_profit = float(np.sum(sell_prices[buy_mask] - close[buy_mask]))
+        return self._set_results(int(buy_mask.sum()), total_profit)
+
+    def run_backtest_by_row(self):
+        """
+        Row-by-row backtest with one predict call per row, kept as the reference for run_backtest.
+        """
         total_trades = 0
         total_profit = 0.0
 
@@ -35,11 +66,15 @@ class Backtester:
                 # self.logger.logger.info(f"buying...")
                 buy_price = row['close']
                 sell_price = self._simulate_sell(count)
-                profit = sell_price - buy_price
-                total_profit += profit
-                total_trades += 1
+                if sell_price is not None:
+                    profit = sell_price - buy_price
+                    total_profit += profit
+                    total_trades += 1
             count += 1
 
+        return self._set_results(total_trades, total_profit)
+
+    def _set_results(self, total_trades, total_profit):
         average_profit = total_profit / total_trades if total_trades > 0 else 0
 
         self.results['total_trades'] = total_trades
@@ -47,6 +82,16 @@ class Backtester:
         self.results['average_profit'] = average_profit
         return self.results
 
+    def _buy_mask(self):
+        """
+        :return: Boolean array, True for every row _should_buy would buy on.
+        """
+        if self.model:
+            predictions = np.asarray(self.model.predict(self.data[self.model_features].to_numpy()))
+            return (predictions == 1) | (predictions == 'buy')
+        labels = self.data['label'].to_numpy()
+        return (labels == 1) | (labels == 'buy')
+
     def _should_buy(self, row):
         """
         Determines whether to buy based on the given row of data.
@@ -60,11 +105,10 @@ class Backtester:
         if self.model:
             # Convert row to numpy array and reshape for single prediction
             prediction = self.model.predict(row_filtered.values.reshape(1, -1))
-            # Assuming 1 represents 'buy' and 0 represents 'sell' after encoding
-            return prediction[0] == 1 or 'buy'
+            # labels are 'buy' / 'hold' / 'sell', or 1 for buy when encoded
+            return prediction[0] == 1 or prediction[0] == 'buy'
         else:
-            # Assuming 'buy' is encoded as 1
-            return row['label'] == 1
+            return row['label'] == 1 or row['label'] == 'buy'
 
     def _simulate_sell(self, current_index):
         """
@@ -78,14 +122,14 @@ class Backtester:
         try:
             # self.logger.logger.info("simulating sell...")
             if isinstance(current_index, int):
-                sell_index = min(current_index + 5, len(self.data) - 1)  # Example: Sell after 5 days
+                sell_index = min(current_index + self.holding_period, len(self.data) - 1)
 
                 sell_price = self.data.iloc[sell_index]['close']
 
                 if pd.notna(sell_price):
                     return sell_price
                 else:
-                    self.logger.logger.info(f"No valid sell price at index {sell_index}")
+                    self.logger.debug_hot_path("No valid sell price at index {}", sell_index)
                     return None  # or some default value if appropriate
         except Exception as e:
             self.logger.log_error(e, f"Error simulating sell", True)
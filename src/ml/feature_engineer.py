@@ -1,4 +1,9 @@
+import numpy as np
+import pandas as pd
+
+from src.models.stock.indicator_registry import IndicatorPlan
 from src.models.stock.indicators import Indicators
+from src.models.stock.panel_indicators import PanelIndicators
 
 
 def add_technical_indicators(data, indicators):
@@ -9,47 +14,42 @@ def add_technical_indicators(data, indicators):
     :param indicators: List of indicators to add.
     :return: Stock data with added features as a dictionary of DataFrames.
     """
-    # print(data)
-    if 'sma' in indicators:
-        indicator_calculator = Indicators(data)
-        sma = indicator_calculator.simple_moving_average()
-        data['SMA'] = sma
-    if 'ema' in indicators:
-        indicator_calculator = Indicators(data)
-        ema = indicator_calculator.simple_moving_average()
-        data['EMA'] = ema
-    if 'rsi' in indicators:
-        indicator_calculator = Indicators(data)
-        rsi = indicator_calculator.rsi()
-        data['RSI'] = rsi
-    if 'macd' in indicators:
-        # Initialize the Indicators class with the DataFrame
-        indicator_calculator = Indicators(data)
-        macd_line, signal_line = indicator_calculator.macd()
-        data['MACD'] = macd_line
-        data['MACD_Signal'] = signal_line
-    if 'bb' in indicators:
-        # Initialize the Indicators class with the DataFrame
-        indicator_calculator = Indicators(data)
-        bb_upper, bb_lower = indicator_calculator.bollinger_bands()
-        data['BB_Upper'] = bb_upper
-        data['BB_Lower'] = bb_lower
-    if 'vwap' in indicators:
-        # Initialize the Indicators class with the DataFrame
-        indicator_calculator = Indicators(data)
-        data['VWAP'] = indicator_calculator.vwap()
-    if 'stoch' in indicators:
-        # Initialize the Indicators class with the DataFrame
-        indicator_calculator = Indicators(data)
-        stoch_k, stoch_d = indicator_calculator.stochastic_oscillator()
-        data['Stochastic_K'] = stoch_k
-        data['Stochastic_D'] = stoch_d
+    features = IndicatorPlan(indicators).evaluate(Indicators(data))
+    for column, values in features.items():
+        data[column] = values
 
     return data
 
 
-def engineer_features_for_stock_prices(stock_prices, indicators_to_use):
+def add_technical_indicators_to_panel(stock_price_dfs, indicators, panel=None):
+    """
+    Same features as add_technical_indicators, computed for every frame in one PanelIndicators pass.
+
+    :param stock_price_dfs: List of per-symbol DataFrames.
+    :param indicators: List of indicators to add.
+    :param panel: Optional PanelIndicators already built over stock_price_dfs, its parameters are used.
+    :return: List of new DataFrames with the added features, in the same order.
+    """
+    if not stock_price_dfs:
+        return stock_price_dfs
+
+    panel = panel or PanelIndicators.from_frames(stock_price_dfs)
+    features = IndicatorPlan.for_engine(indicators, panel).evaluate(panel)
+
+    # one block per frame instead of a column insert per feature and frame
+    feature_columns = list(features)
+    feature_block = np.column_stack([features[column] for column in feature_columns]) if features else None
     ret_val = []
-    for stock_price_df in stock_prices:
-        ret_val.append(add_technical_indicators(stock_price_df, indicators_to_use))
+    for data, start, stop in zip(stock_price_dfs, panel.starts, panel.stops):
+        if feature_block is None:
+            ret_val.append(data)
+            continue
+        data = data.drop(columns=[column for column in feature_columns if column in data.columns])
+        ret_val.append(pd.concat([data, pd.DataFrame(feature_block[start:stop], columns=feature_columns,
+                                                     index=data.index)], axis=1))
+
     return ret_val
+
+
+def engineer_features_for_stock_prices(stock_prices, indicators_to_use):
+    return add_technical_indicators_to_panel(list(stock_prices), indicators_to_use)
@@ -19,11 +19,14 @@ def _label_stock(data, threshold=0.03):
 class LabelGenerator:
     logger = StockLogger()
 
-    def __init__(self, look_forward=5):
+    def __init__(self, look_forward=5, threshold=0.03):
         """
         Initializes the label generator with a look-forward period.
+
+        :param threshold: Percentage change threshold to determine buy/sell.
         """
         self.look_forward = look_forward
+        self.threshold = threshold
         self.numeric_columns = ['open', 'high', 'low', 'close', 'volume', 'trade_count', 'vwap']
 
     def generate_labels(self, stock_data):
@@ -39,7 +42,7 @@ class LabelGenerator:
 
         stock_data['future_close'] = stock_data['close'].shift(-self.look_forward)
         stock_data.dropna(subset=['future_close'], inplace=True)  # Remove rows with NaN in future_close
-        stock_data['label'] = _label_stock(stock_data)
+        stock_data['label'] = _label_stock(stock_data, self.threshold)
         stock_data.drop(columns=['future_close'], inplace=True)  # Optional: remove if future close not needed later
 
         return stock_data
@@ -0,0 +1,107 @@
+import os
+import pickle
+import threading
+
+from src.constants import global_model_cache_dir
+from src.postgres.stock_trader_db import StockTraderDb
+from src.utils.file_manager import relative_path, create_dir_if_not_exists
+from src.utils.stock_logger import StockLogger
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of deserialized models, in memory and as pickles on local disk, keyed by model id and version.
+
+    get asks the database for the latest id and version only, and transfers and unpickles the stored model only when
+    that version is in neither cache. A new process starts from the disk cache instead of the database.
+    """
+    logger = StockLogger("ModelRegistry")
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(ModelRegistry, cls).__new__(cls)
+                cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self, cache_dir=global_model_cache_dir):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.cache_dir = os.path.join(relative_path, cache_dir)
+        self.stock_trader_db = StockTraderDb()
+        # model_name -> model data of the latest version seen
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _path(self, model_name, model_id, model_version):
+        return os.path.join(self.cache_dir, f"{model_name}__{model_id}__{model_version}.pkl")
+
+    def get(self, model_name):
+        """
+        :return: Model data like StockTraderDb.get_model for the latest version of model_name, or None.
+        """
+        try:
+            latest = self.stock_trader_db.get_model_version(model_name)
+        except Exception as e:
+            self.logger.log_error(e, f"Error getting the latest version of {model_name}", False)
+            return self._load_from_db(model_name)
+        if latest is None:
+            return None
+
+        model_id, model_version = latest
+        with self._lock:
+            model_data = self._models.get(model_name)
+        if model_data is not None and (model_data['id'], model_data['model_version']) == (model_id, model_version):
+            return model_data
+
+        return self._load_from_disk(model_name, model_id, model_version) or self._load_from_db(model_name)
+
+    def invalidate(self, model_name=None):
+        """
+        Drops model_name, or every model, from memory. The disk cache is keyed by version and never goes stale.
+        """
+        with self._lock:
+            if model_name is None:
+                self._models.clear()
+            else:
+                self._models.pop(model_name, None)
+
+    def _remember(self, model_name, model_data):
+        with self._lock:
+            self._models[model_name] = model_data
+        return model_data
+
+    def _load_from_disk(self, model_name, model_id, model_version):
+        path = self._path(model_name, model_id, model_version)
+        try:
+            with open(path, 'rb') as model_file:
+                model_data = pickle.load(model_file)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            self.logger.log_error(e, f"Discarding unreadable cached model {path}", False)
+            return None
+        self.logger.logger.debug(f"loaded {model_name} version {model_version} from {path}")
+        return self._remember(model_name, model_data)
+
+    def _load_from_db(self, model_name):
+        model_data = self.stock_trader_db.get_model(model_name=model_name)
+        if model_data is None:
+            return None
+        self.logger.logger.debug(f"loaded {model_name} version {model_data['model_version']} from the database")
+        self._save_to_disk(model_name, model_data)
+        return self._remember(model_name, model_data)
+
+    def _save_to_disk(self, model_name, model_data):
+        path = self._path(model_name, model_data['id'], model_data['model_version'])
+        try:
+            create_dir_if_not_exists(self.cache_dir)
+            with open(f"{path}.tmp", 'wb') as model_file:
+                pickle.dump(model_data, model_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            self.logger.log_error(e, f"Error caching model {model_name} to {path}", False)
@@ -0,0 +1,78 @@
+import numpy as np
+
+from src.utils.stock_logger import StockLogger
+
+
+class ModelScorer:
+    """
+    Inference only scoring with a stored model. The model, its fitted scaler and its training column order are loaded
+    once, after which every call only transforms and predicts the requested rows, no splitting or refitting.
+
+    :param model: Fitted estimator.
+    :param scaler: Scaler fitted on the training features. Models stored without one were trained on scaled features
+        too and cannot be scored here, use can_score to check first.
+    :param feature_columns: Training column order, None falls back to every numeric column like ModelTraining.prep.
+    """
+    logger = StockLogger('ModelScorer')
+
+    def __init__(self, model, scaler, feature_columns=None):
+        if scaler is None:
+            raise ValueError("Cannot score a model stored without its fitted scaler")
+        self.model = model
+        self.scaler = scaler
+        self.feature_columns = feature_columns
+
+    @staticmethod
+    def can_score(model_data):
+        """
+        :return: Whether model_data carries the fitted scaler scoring needs.
+        """
+        return model_data is not None and model_data.get('scaler') is not None
+
+    @classmethod
+    def from_model_data(cls, model_data):
+        """
+        :param model_data: Dictionary returned by StockTraderDb.get_model.
+        """
+        return cls(model_data['model'], model_data.get('scaler'), model_data.get('feature_columns'))
+
+    def features(self, df, rows=1):
+        """
+        :param df: Prepared feature DataFrame for one symbol, any row order.
+        :param rows: Number of latest rows to return.
+        :return: float64 feature matrix of the latest rows, oldest first.
+        """
+        latest = df.sort_values(by='timestamp').tail(rows) if 'timestamp' in df.columns else df.tail(rows)
+        if self.feature_columns is not None:
+            values = latest[self.feature_columns]
+        else:
+            values = latest.select_dtypes(include=[np.number])
+        # a DataFrame keeps the column names the scaler was fitted with
+        return self.scaler.transform(values.astype('float64'))
+
+    def score(self, df, rows=1):
+        """
+        :return: (predicted classes, probability of each predicted class or None) for the latest rows, oldest first.
+        """
+        X = self.features(df, rows)
+        if len(X) == 0:
+            return np.empty(0, dtype=object), None
+        predictions = self.model.predict(X)
+        if not hasattr(self.model, 'predict_proba'):
+            return predictions, None
+        try:
+            probabilities = self.model.predict_proba(X)
+        except AttributeError:
+            # e.g. SVC fitted without probability=True
+            return predictions, None
+        class_positions = np.searchsorted(self.model.classes_, predictions)
+        return predictions, probabilities[np.arange(len(X)), class_positions]
+
+    def score_latest(self, df):
+        """
+        :return: (class, probability or None) for the latest row, ('hold', None) when there is no row to score.
+        """
+        predictions, probabilities = self.score(df, rows=1)
+        if len(predictions) == 0:
+            return 'hold', None
+        return predictions[-1], None if probabilities is None else float(probabilities[-1])
@@ -4,15 +4,6 @@ from datetime import date
 
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import classification_report, accuracy_score
-from sklearn.model_selection import train_test_split
-from sklearn.naive_bayes import GaussianNB
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.preprocessing import StandardScaler
-from sklearn.svm import SVC
-from sklearn.tree import DecisionTreeClassifier
 
 from src.config.config_manager import ConfigManager
 from src.trading.brokerages.alpaca.alpaca_utils import convert_stock_price_list_to_df
@@ -27,7 +18,8 @@ def get_model_data_for_insert(trainer, indicators_to_use):
     accuracy_score = trainer.accuracy_score
     classification_report = trainer.classification_report
     additional_info = trainer.additional_info
-    model = trainer.ml_model
+    # the fitted scaler and column order travel with the model so it can score new rows without refitting
+    model = {'model': trainer.ml_model, 'scaler': trainer.scaler, 'feature_columns': trainer.feature_columns}
     serialized_model = pickle.dumps(model)
     encoded_model = base64.b64encode(serialized_model).decode('utf-8')
     model_data = [{
@@ -59,6 +51,8 @@ class ModelTraining:
     X_train_scaled = None
     X_test_scaled = None
     original_test_indices = None
+    scaler = None
+    feature_columns = None
 
     _instance = None
 
@@ -67,6 +61,13 @@ class ModelTraining:
             cls._instance = super(ModelTraining, cls).__new__(cls)
         return cls._instance
 
+    @classmethod
+    def reset(cls):
+        """
+        Drops the shared instance, the next ModelTraining starts without the splits, scaler or scores of the last.
+        """
+        cls._instance = None
+
     def __init__(self, labeled_stock_data, model=None, version=None, _id=None, additional_info=None):
         self.labeled_stock_data = labeled_stock_data
         self.training_date = date.today()
@@ -86,10 +87,15 @@ class ModelTraining:
         return self.X_train_scaled, self.X_test_scaled, self.y_train, self.y_test
 
     def prep(self, data):
+        # sklearn is imported where it is used, jobs that never train do not pay for it at startup
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler
+
         data.dropna(subset=['label'], inplace=True)
 
         X = data.select_dtypes(include=[np.number])
         y = data['label']
+        self.feature_columns = list(X.columns)
 
         # Splitting the data, retaining timestamps
         self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
@@ -98,9 +104,9 @@ class ModelTraining:
         self.original_test_indices = self.X_test.index
 
         # Standardizing the numerical data
-        scaler = StandardScaler()
-        self.X_train = scaler.fit_transform(self.X_train)
-        self.X_test = scaler.transform(self.X_test)
+        self.scaler = StandardScaler()
+        self.X_train = self.scaler.fit_transform(self.X_train)
+        self.X_test = self.scaler.transform(self.X_test)
 
         return self.X_train, self.X_test, self.y_train, self.y_test
 
@@ -138,6 +144,8 @@ class ModelTraining:
         :param y_test: Testing labels.
         :return: Evaluation metrics.
         """
+        from sklearn.metrics import classification_report, accuracy_score
+
         self.predictions = self.ml_model.predict(self.X_test)
         self.accuracy_score = accuracy_score(self.y_test, self.predictions)
         self.classification_report = classification_report(self.y_test, self.predictions)
@@ -179,7 +187,7 @@ class ModelTraining:
                     "symbol": row['symbol'],
                     "prediction": row['model_prediction'],
                     "prediction_date": str(date.today()),
-                    "timestamp": row['timestamp'],
+                    "timestamp": str(row['timestamp']),
                     "model_version": self.version,
                     "model_id": self.id
                 } for index, row in combined_stock_data.iterrows() if not pd.isna(row['model_prediction'])
@@ -191,18 +199,25 @@ class ModelTraining:
     def get_model_to_use(self):
         if self.model_to_use is not None:
             if self.model_to_use == 'random_forest':
+                from sklearn.ensemble import RandomForestClassifier
                 return RandomForestClassifier(random_state=42)
             elif self.model_to_use == 'logistic_regression':
+                from sklearn.linear_model import LogisticRegression
                 return LogisticRegression(random_state=42)
             elif self.model_to_use == 'svm':
+                from sklearn.svm import SVC
                 return SVC(random_state=42)
             elif self.model_to_use == 'knn':
+                from sklearn.neighbors import KNeighborsClassifier
                 return KNeighborsClassifier()
             elif self.model_to_use == 'naive_bayes':
+                from sklearn.naive_bayes import GaussianNB
                 return GaussianNB()
             elif self.model_to_use == 'decision_tree':
+                from sklearn.tree import DecisionTreeClassifier
                 return DecisionTreeClassifier(random_state=42)
             else:
                 self.logger.logger.error(f"Invalid model_to_use: {self.model_to_use}")
         else:
+            from sklearn.ensemble import RandomForestClassifier
             return RandomForestClassifier(random_state=42)
\ No newline at end of file
@@ -0,0 +1,182 @@
+import itertools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from src.constants import global_parameter_sweep_results_dir, global_backtest_workers
+from src.ml.backtester import Backtester
+from src.ml.data_cleaner import clean_stock_prices
+from src.ml.feature_engineer import add_technical_indicators_to_panel
+from src.ml.label_generator import LabelGenerator
+from src.ml.model_training import ModelTraining
+from src.models.stock.panel_indicators import PanelIndicators
+from src.utils.file_manager import relative_path, create_dir_if_not_exists
+from src.utils.stock_logger import StockLogger
+
+# grid keys in nesting order, points that share the outer keys run back to back and reuse their intermediates
+sweep_parameters = ['window', 'num_std_dev', 'short_window', 'long_window', 'signal_window', 'look_forward',
+                    'threshold']
+sweep_metrics = ['accuracy_score', 'total_trades', 'total_profit', 'average_profit', 'symbols', 'seconds', 'error']
+
+# set once per worker process by _init_worker
+_worker_stock_price_dfs = None
+_worker_indicators_to_use = None
+_worker_panel = None
+
+
+def expand_grid(grid):
+    """
+    :param grid: Dictionary of parameter name to list of values, missing parameters keep their defaults.
+    :return: List of parameter dictionaries, one per combination, nested in sweep_parameters order.
+    """
+    names = [name for name in sweep_parameters if name in grid]
+    unknown = [name for name in grid if name not in sweep_parameters]
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {unknown}")
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+class _ScaledModel:
+    """
+    Trained model as the backtester calls it, on raw feature rows in feature_columns order. The rows are scaled with
+    the trainer's scaler first, as they were for training.
+    """
+
+    def __init__(self, trainer):
+        self.model = trainer.ml_model
+        self.scaler = trainer.scaler
+        self.feature_columns = trainer.feature_columns
+
+    def predict(self, X):
+        return self.model.predict(self.scaler.transform(pd.DataFrame(X, columns=self.feature_columns)))
+
+
+def _init_worker(stock_price_dfs, indicators_to_use):
+    global _worker_stock_price_dfs, _worker_indicators_to_use, _worker_panel
+    _worker_stock_price_dfs = stock_price_dfs
+    _worker_indicators_to_use = indicators_to_use
+    _worker_panel = PanelIndicators.from_frames(stock_price_dfs)
+
+
+def _evaluate_point(params):
+    """
+    Features, labels, training and backtest for one grid point, on the worker's shared bars and panel.
+
+    :return: Dictionary of the point's parameters and metrics.
+    """
+    start_time = time.perf_counter()
+    result = dict(params)
+    try:
+        panel = _worker_panel
+        panel.window = params.get('window', panel.window)
+        panel.bb_params = {'num_std_dev': params.get('num_std_dev', panel.bb_params['num_std_dev'])}
+        panel.macd_params = {key: params.get(key, panel.macd_params[key])
+                             for key in ['short_window', 'long_window', 'signal_window']}
+
+        stock_data_with_features = add_technical_indicators_to_panel(_worker_stock_price_dfs,
+                                                                     _worker_indicators_to_use, panel=panel)
+        # only the parameter specific outputs are dropped, shared rolling and ewm intermediates stay cached
+        panel.forget('bb', 'macd')
+
+        label_generator = LabelGenerator(look_forward=params.get('look_forward', 5),
+                                         threshold=params.get('threshold', 0.03))
+        labeled_stock_data = label_generator.generate_labels_for_stocks_prices(
+            clean_stock_prices(stock_data_with_features))
+        labeled_stock_data = [labeled_stock for labeled_stock in labeled_stock_data if len(labeled_stock) > 0]
+
+        # trained like BacktestMl, on every numeric column, by a trainer that shares no state with the last point
+        ModelTraining.reset()
+        trainer = ModelTraining(labeled_stock_data)
+        trainer.prepare_data_for_multiple_stocks()
+        trainer.train_model()
+        trainer.evaluate_model()
+
+        # the backtester scores the columns the model was trained on, not ModelFeatures
+        scaled_model = _ScaledModel(trainer)
+        total_trades, total_profit = 0, 0.0
+        for labeled_stock in labeled_stock_data:
+            backtest_results = Backtester(labeled_stock, labeled_stock['symbol'].iloc[0], trainer.feature_columns,
+                                          scaled_model).run_backtest()
+            total_trades += backtest_results['total_trades']
+            total_profit += backtest_results['total_profit']
+
+        result.update({
+            'accuracy_score': trainer.accuracy_score,
+            'total_trades': total_trades,
+            'total_profit': total_profit,
+            'average_profit': total_profit / total_trades if total_trades > 0 else 0,
+            'symbols': len(labeled_stock_data),
+            'error': None,
+        })
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start_time
+    return result
+
+
+class ParameterSweep:
+    """
+    Runs the feature, label, training and backtest pipeline for every point of a parameter grid.
+
+    The bars are sent to each worker process once. Each worker keeps one PanelIndicators over them, so rolling
+    windows, EWMs and other intermediates that several grid points share are computed once per worker. Grid points
+    are handed out in contiguous runs to keep that reuse high.
+
+    :param stock_price_dfs: List of per-symbol price DataFrames, as returned by convert_stock_price_list_to_df.
+    :param max_workers: Number of worker processes, defaults to global_backtest_workers or every core.
+    """
+    logger = StockLogger('ParameterSweep')
+
+    def __init__(self, stock_price_dfs, indicators_to_use, grid, max_workers=global_backtest_workers):
+        self.stock_price_dfs = [df for df in stock_price_dfs if len(df) > 0]
+        self.indicators_to_use = indicators_to_use
+        self.points = expand_grid(grid)
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def run(self, rank_by='total_profit'):
+        """
+        :return: DataFrame with one row per grid point, best rank_by first and failed points last.
+        """
+        workers = min(self.max_workers, len(self.points))
+        self.logger.logger.info(f"sweeping {len(self.points)} grid points over {len(self.stock_price_dfs)} symbols "
+                                f"on {workers} processes")
+        executor = None
+        if workers > 1:
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                               initargs=(self.stock_price_dfs, self.indicators_to_use))
+            except (OSError, NotImplementedError) as e:
+                # no working multiprocessing on this platform or sandbox, e.g. no sem_open
+                self.logger.logger.warning(f"Could not start sweep processes, running in process: {e}")
+
+        if executor is None:
+            _init_worker(self.stock_price_dfs, self.indicators_to_use)
+            results = [_evaluate_point(params) for params in self.points]
+        else:
+            with executor:
+                chunksize = max(1, math.ceil(len(self.points) / (workers * 2)))
+                results = list(executor.map(_evaluate_point, self.points, chunksize=chunksize))
+
+        results_df = pd.DataFrame(results, columns=list(dict.fromkeys(
+            [name for params in self.points for name in params] + sweep_metrics)))
+        results_df.sort_values(by=['error', rank_by], ascending=[True, False], na_position='first', inplace=True,
+                               key=lambda column: column.notna() if column.name == 'error' else column)
+        results_df.insert(0, 'rank', range(1, len(results_df) + 1))
+        return results_df.reset_index(drop=True)
+
+    @staticmethod
+    def write_results(results_df, results_dir=global_parameter_sweep_results_dir):
+        """
+        Writes the ranked results table as csv.
+
+        :return: Path of the written file.
+        """
+        path = os.path.join(relative_path, results_dir)
+        create_dir_if_not_exists(path)
+        file_path = os.path.join(path, f"parameter_sweep_{datetime.now().strftime('%Y-%m-%d__%H_%M_%S')}.csv")
+        results_df.to_csv(file_path, index=False)
+        return file_path
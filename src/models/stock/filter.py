@@ -27,6 +27,16 @@ class Filter:
             return False
         return volume >= float(self.min_volume)
 
+    def mask(self, prices, volumes):
+        """
+        Vectorized price_is_valid and volume_is_valid over whole columns.
+
+        :param prices: Array or Series of close prices.
+        :param volumes: Array or Series of volumes.
+        :return: Boolean array, True where both checks pass. NaN fails both checks.
+        """
+        return (prices >= self.min_price) & (prices <= self.max_price) & (volumes >= float(self.min_volume))
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,145 @@
+import math
+
+from src.constants import global_bb_params, global_macd_params, global_indicators_window, \
+    global_ewm_warmup_tolerance, global_indicator_feature_version
+
+# engine methods that compute each kind of shared intermediate, keys are (kind, column, parameter...)
+intermediate_methods = {
+    'rolling_mean': '_rolling_mean',
+    'rolling_std': '_rolling_std',
+    'rolling_min': '_rolling_min',
+    'rolling_max': '_rolling_max',
+    'ewm_mean': '_ewm_mean',
+    'diff': '_diff',
+}
+
+
+def ewm_warmup(span, tolerance=global_ewm_warmup_tolerance):
+    """
+    Number of bars an adjust=False EWM needs before the weight left on anything older drops below tolerance.
+    """
+    alpha = 2 / (span + 1)
+    return math.ceil(math.log(tolerance) / math.log(1 - alpha))
+
+
+class IndicatorSpec:
+    """
+    Declares one indicator: the engine method that computes it, the feature columns it produces, the shared
+    intermediates it reads and how many trailing bars its last value depends on.
+
+    :param outputs: Feature column names in the order the method returns them.
+    :param inputs: Function of the indicator params returning intermediate keys.
+    :param lookback: Function of the indicator params returning a bar count, or None when it needs all history.
+    :param columns: Order the feature columns are added to a frame in, defaults to outputs.
+    """
+
+    def __init__(self, name, method, outputs, inputs, lookback, columns=None):
+        self.name = name
+        self.method = method
+        self.outputs = outputs
+        self.inputs = inputs
+        self.lookback = lookback
+        self.features = columns or outputs
+
+
+# registry order is the order feature columns are added in, which the trained models were built with
+indicator_registry = {spec.name: spec for spec in [
+    IndicatorSpec('sma', 'simple_moving_average', ['SMA'],
+                  lambda p: [('rolling_mean', 'close', p['window'])],
+                  lambda p: p['window']),
+    IndicatorSpec('ema', 'exponential_moving_average', ['EMA'],
+                  lambda p: [('ewm_mean', 'close', p['window'])],
+                  lambda p: ewm_warmup(p['window'])),
+    IndicatorSpec('rsi', 'rsi', ['RSI'],
+                  lambda p: [('diff', 'close')],
+                  lambda p: 14 + 1),
+    IndicatorSpec('macd', 'macd', ['MACD', 'MACD_Signal'],
+                  lambda p: [('ewm_mean', 'close', p['macd_params']['short_window']),
+                             ('ewm_mean', 'close', p['macd_params']['long_window'])],
+                  lambda p: ewm_warmup(max(p['macd_params']['short_window'], p['macd_params']['long_window'])) +
+                  ewm_warmup(p['macd_params']['signal_window'])),
+    IndicatorSpec('bb', 'bollinger_bands', ['BB_Lower', 'BB_Upper'],
+                  lambda p: [('rolling_mean', 'close', p['window']), ('rolling_std', 'close', p['window'])],
+                  lambda p: p['window'],
+                  columns=['BB_Upper', 'BB_Lower']),
+    # Indicators.vwap divides by the cumulative volume, so the whole history matters
+    IndicatorSpec('vwap', 'vwap', ['VWAP'],
+                  lambda p: [],
+                  lambda p: None),
+    IndicatorSpec('stoch', 'stochastic_oscillator', ['Stochastic_K', 'Stochastic_D'],
+                  lambda p: [('rolling_min', 'low', 14), ('rolling_max', 'high', 14)],
+                  lambda p: 14 + 3 - 1),
+]}
+
+
+# specs that replace indicator_registry entries in the features of a feature version. Version 1 is what every stored
+# model was trained on: the EMA column was filled with the SMA, and BB_Upper/BB_Lower took bollinger_bands' (lower,
+# upper) in the wrong order. Indicators.latest and lookback keep using indicator_registry, the real indicators.
+feature_version_specs = {
+    1: {
+        'ema': IndicatorSpec('ema', 'simple_moving_average', ['EMA'],
+                             lambda p: [('rolling_mean', 'close', p['window'])],
+                             lambda p: p['window']),
+        'bb': IndicatorSpec('bb', 'bollinger_bands', ['BB_Upper', 'BB_Lower'],
+                            lambda p: [('rolling_mean', 'close', p['window']), ('rolling_std', 'close', p['window'])],
+                            lambda p: p['window']),
+    },
+    2: {},
+}
+
+
+class IndicatorPlan:
+    """
+    Deduplicated computation plan for a set of indicators. Every shared intermediate, like the rolling mean behind
+    both sma and bb or the close EWMs behind ema and macd, is evaluated once before the indicators that read it.
+    Runs on any engine with the Indicators method names, Indicators for one frame or PanelIndicators for many.
+
+    :param feature_version: Key of feature_version_specs, must match the version the scored model was trained on.
+    """
+
+    def __init__(self, indicators_to_use, bb_params=global_bb_params, macd_params=global_macd_params,
+                 window=global_indicators_window, feature_version=global_indicator_feature_version):
+        unknown = [name for name in indicators_to_use if name not in indicator_registry]
+        if unknown:
+            raise ValueError(f"Unknown indicators: {unknown}")
+        if feature_version not in feature_version_specs:
+            raise ValueError(f"Unknown feature version: {feature_version}")
+
+        self.params = {'window': window or 20, 'bb_params': bb_params, 'macd_params': macd_params}
+        overrides = feature_version_specs[feature_version]
+        self.specs = [overrides.get(name, spec) for name, spec in indicator_registry.items()
+                      if name in indicators_to_use]
+        self.intermediates = list(dict.fromkeys(key for spec in self.specs for key in spec.inputs(self.params)))
+        self.min_history = {spec.name: spec.lookback(self.params) for spec in self.specs}
+
+    @classmethod
+    def for_engine(cls, indicators_to_use, engine):
+        return cls(indicators_to_use, engine.bb_params, engine.macd_params, engine.window)
+
+    @property
+    def features(self):
+        return [feature for spec in self.specs for feature in spec.features]
+
+    @property
+    def required_history(self):
+        """
+        :return: Bars needed for the last value of every planned indicator, None when one needs all history.
+        """
+        if any(lookback is None for lookback in self.min_history.values()):
+            return None
+        return max(self.min_history.values(), default=0)
+
+    def evaluate(self, engine):
+        """
+        :param engine: Indicators or PanelIndicators built with the same params as this plan.
+        :return: Dictionary of feature column to values.
+        """
+        for key in self.intermediates:
+            getattr(engine, intermediate_methods[key[0]])(*key[1:])
+
+        features = {}
+        for spec in self.specs:
+            values = getattr(engine, spec.method)()
+            outputs = dict(zip(spec.outputs, values if isinstance(values, tuple) else (values,)))
+            features.update((feature, outputs[feature]) for feature in spec.features)
+        return features
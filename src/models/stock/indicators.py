@@ -1,5 +1,6 @@
 from src.constants import global_bb_params, global_macd_params, global_indicators_window
 from src.ml.ml_vars import ModelFeatures
+from src.models.stock.indicator_registry import indicator_registry
 from src.utils.stock_logger import StockLogger
 from enum import Enum
 
@@ -29,57 +30,155 @@ class Indicators:
     ema = None
 
     def __init__(self, df, bb_params=global_bb_params, macd_params=global_macd_params, window=global_indicators_window):
+        self._cache = {}
         self.df = df
         self.window = window or 20
         self.bb_params = bb_params
         self.macd_params = macd_params
 
+    @property
+    def df(self):
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        # every cached series belongs to the frame it was computed from
+        self._df = df
+        self._cache = {}
+
+    def _memoize(self, key, compute):
+        """
+        Returns the cached result for key, computing and storing it on the first call. Keys hold the indicator name
+        and every parameter that affects the result.
+        """
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def _rolling_mean(self, column, window):
+        return self._memoize(('rolling_mean', column, window), lambda: self.df[column].rolling(window=window).mean())
+
+    def _rolling_std(self, column, window):
+        return self._memoize(('rolling_std', column, window), lambda: self.df[column].rolling(window=window).std())
+
+    def _rolling_min(self, column, window):
+        return self._memoize(('rolling_min', column, window), lambda: self.df[column].rolling(window=window).min())
+
+    def _rolling_max(self, column, window):
+        return self._memoize(('rolling_max', column, window), lambda: self.df[column].rolling(window=window).max())
+
+    def _ewm_mean(self, column, span):
+        return self._memoize(('ewm_mean', column, span), lambda: self.df[column].ewm(span=span, adjust=False).mean())
+
+    def _diff(self, column):
+        return self._memoize(('diff', column), lambda: self.df[column].diff())
+
     def bollinger_bands(self):
         window = self.window
         num_std_dev = self.bb_params['num_std_dev']
-        sma = self.df['close'].rolling(window=window).mean()
-        std = self.df['close'].rolling(window=window).std()
-        self.bb_upper = sma + (std * num_std_dev)
-        self.bb_lower = sma - (std * num_std_dev)
-        return sma - (std * num_std_dev), sma + (std * num_std_dev)
+
+        def compute():
+            sma = self._rolling_mean('close', window)
+            std = self._rolling_std('close', window)
+            return sma - (std * num_std_dev), sma + (std * num_std_dev)
+
+        bb_lower, bb_upper = self._memoize(('bb', window, num_std_dev), compute)
+        self.bb_upper = bb_upper
+        self.bb_lower = bb_lower
+        return bb_lower, bb_upper
 
     def vwap(self):
-        cumulative = self.df['close'] * self.df['volume']
-        cumulative_volume = self.df['volume'].cumsum()
-        return cumulative / cumulative_volume
+        def compute():
+            cumulative = self.df['close'] * self.df['volume']
+            cumulative_volume = self.df['volume'].cumsum()
+            return cumulative / cumulative_volume
+
+        return self._memoize(('vwap',), compute)
 
     def macd(self):
         short_window = self.macd_params['short_window']
         long_window = self.macd_params['long_window']
         signal_window = self.macd_params['signal_window']
-        short_ema = self.df['close'].ewm(span=short_window, adjust=False).mean()
-        long_ema = self.df['close'].ewm(span=long_window, adjust=False).mean()
-        macd_line = short_ema - long_ema
-        signal_line = macd_line.ewm(span=signal_window, adjust=False).mean()
-        return macd_line, signal_line
+
+        def compute():
+            short_ema = self._ewm_mean('close', short_window)
+            long_ema = self._ewm_mean('close', long_window)
+            macd_line = short_ema - long_ema
+            signal_line = macd_line.ewm(span=signal_window, adjust=False).mean()
+            return macd_line, signal_line
+
+        return self._memoize(('macd', short_window, long_window, signal_window), compute)
 
     def is_macd_positive(self):
-        macd_line, signal_line = self.macd()
-        return macd_line.iloc[-1] > signal_line.iloc[-1]
+        macd_line, signal_line = self.latest(IndicatorsEnum.MACD.value)
+        return macd_line > signal_line
 
     # Relative Strength Index
     def rsi(self, period=14):
-        delta = self.df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
+        def compute():
+            delta = self._diff('close')
+            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            rs = gain / loss
+            return 100 - (100 / (1 + rs))
+
+        return self._memoize(('rsi', period), compute)
 
     # Stochastic Oscillator
     def stochastic_oscillator(self, k_period=14, d_period=3):
-        low_min = self.df['low'].rolling(window=k_period).min()
-        high_max = self.df['high'].rolling(window=k_period).max()
-        k_line = 100 * ((self.df['close'] - low_min) / (high_max - low_min))
-        d_line = k_line.rolling(window=d_period).mean()
-        return k_line, d_line
+        def compute():
+            low_min = self._rolling_min('low', k_period)
+            high_max = self._rolling_max('high', k_period)
+            k_line = 100 * ((self.df['close'] - low_min) / (high_max - low_min))
+            d_line = k_line.rolling(window=d_period).mean()
+            return k_line, d_line
+
+        return self._memoize(('stoch', k_period, d_period), compute)
 
     def simple_moving_average(self):
-        return self.df['close'].rolling(window=self.window).mean()
+        return self._rolling_mean('close', self.window)
 
     def exponential_moving_average(self):
-        return self.df['close'].ewm(span=self.window, adjust=False).mean()
+        return self._ewm_mean('close', self.window)
+
+    @property
+    def params(self):
+        return {'window': self.window, 'bb_params': self.bb_params, 'macd_params': self.macd_params}
+
+    def lookback(self, name):
+        """
+        Number of trailing bars needed to reproduce the last value of an indicator, None when it needs all of them.
+        EWM based indicators get a warm-up margin so the truncated start changes the result by less than
+        global_ewm_warmup_tolerance of the price scale.
+        """
+        return indicator_registry[name].lookback(self.params)
+
+    def latest(self, name):
+        """
+        Last value of an indicator, computed on the shortest tail of the frame that gives the same result instead
+        of the full series. Tuples are returned for bb (lower, upper), macd (line, signal) and stoch (k, d).
+
+        :param name: IndicatorsEnum value.
+        """
+        def compute():
+            if name == IndicatorsEnum.VWAP.value:
+                close = self.df['close'].to_numpy()
+                volume = self.df['volume'].to_numpy()
+                return close[-1] * volume[-1] / volume.sum()
+
+            lookback = self.lookback(name)
+            tail = self if lookback is None or lookback >= len(self.df) else \
+                Indicators(self.df.iloc[-lookback:], self.bb_params, self.macd_params, self.window)
+            series = {
+                IndicatorsEnum.BB.value: tail.bollinger_bands,
+                IndicatorsEnum.MACD.value: tail.macd,
+                IndicatorsEnum.RSI.value: tail.rsi,
+                IndicatorsEnum.STOCH.value: tail.stochastic_oscillator,
+                IndicatorsEnum.EMA.value: tail.exponential_moving_average,
+                IndicatorsEnum.SMA.value: tail.simple_moving_average,
+            }[name]()
+            if isinstance(series, tuple):
+                return tuple(values.iloc[-1] for values in series)
+            return series.iloc[-1]
+
+        return self._memoize(('latest', name), compute)
@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.constants import global_bb_params, global_macd_params, global_indicators_window, \
+    global_panel_chunk_rows
+
+
+class PanelIndicators:
+    """
+    Indicators for many symbols at once.
+
+    The panel is a set of flat column arrays in which every symbol's rows are contiguous, in the order the indicators
+    should run over them. Rolling windows are evaluated with strided window views in chunks of
+    global_panel_chunk_rows rows and EWMs with one pass corrected at symbol boundaries. Any window that would reach
+    into the previous symbol is NaN. The results are the same as running Indicators over each symbol's frame, as
+    flat arrays aligned with the panel.
+    """
+
+    def __init__(self, columns, lengths, bb_params=global_bb_params, macd_params=global_macd_params,
+                 window=global_indicators_window):
+        """
+        :param columns: Dictionary of equal length float arrays, needs close, high, low and volume.
+        :param lengths: Number of rows of each symbol, in panel order.
+        """
+        self.columns = {name: np.asarray(values, dtype='float64') for name, values in columns.items()}
+        self.lengths = np.asarray(lengths, dtype='int64')
+        self.window = window or 20
+        self.bb_params = bb_params
+        self.macd_params = macd_params
+
+        self.stops = np.cumsum(self.lengths)
+        self.starts = self.stops - self.lengths
+        # position of every row inside its symbol
+        self.positions = np.arange(self.stops[-1] if len(self.stops) else 0) - np.repeat(self.starts, self.lengths)
+        self._cache = {}
+
+    @classmethod
+    def from_frames(cls, stock_price_dfs, **kwargs):
+        """
+        Panel over a list of per-symbol frames, keeping each frame's row order.
+        """
+        columns = {name: np.concatenate([df[name].to_numpy(dtype='float64') for df in stock_price_dfs])
+                   if stock_price_dfs else np.empty(0) for name in ['close', 'high', 'low', 'volume']}
+        return cls(columns, [len(df) for df in stock_price_dfs], **kwargs)
+
+    @classmethod
+    def from_long_frame(cls, stock_price_df, **kwargs):
+        """
+        Panel over one long frame with a symbol column whose rows are grouped by symbol.
+        """
+        symbols = stock_price_df['symbol'].to_numpy()
+        change_points = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+        bounds = np.concatenate([[0], change_points, [len(symbols)]]) if len(symbols) else np.zeros(1, dtype='int64')
+        columns = {name: stock_price_df[name].to_numpy(dtype='float64') for name in ['close', 'high', 'low', 'volume']}
+        return cls(columns, np.diff(bounds), **kwargs)
+
+    def split(self, values):
+        """
+        :return: values cut back into one array per symbol.
+        """
+        return [values[start:stop] for start, stop in zip(self.starts, self.stops)]
+
+    def forget(self, *names):
+        """
+        Drops cached results whose key starts with one of names, e.g. the parameter specific bb and macd outputs,
+        while shared intermediates stay cached.
+        """
+        self._cache = {key: value for key, value in self._cache.items() if key[0] not in names}
+
+    def _memoize(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def _rolling(self, values, window, reducer):
+        """
+        Applies reducer over every trailing window of values, NaN where the window is not full or crosses into the
+        previous symbol.
+        """
+        result = np.full(len(values), np.nan)
+        if len(values) < window:
+            return result
+        chunk_rows = max(global_panel_chunk_rows, window)
+        for start in range(window - 1, len(values), chunk_rows):
+            stop = min(start + chunk_rows, len(values))
+            windows = sliding_window_view(values[start - window + 1:stop], window)
+            result[start:stop] = reducer(windows)
+        result[self.positions < window - 1] = np.nan
+        return result
+
+    def _rolling_mean(self, column, window):
+        return self._memoize(('rolling_mean', column, window),
+                             lambda: self._rolling(self.columns[column], window, lambda w: w.mean(axis=1)))
+
+    def _rolling_std(self, column, window):
+        return self._memoize(('rolling_std', column, window),
+                             lambda: self._rolling(self.columns[column], window, lambda w: w.std(axis=1, ddof=1)))
+
+    def _rolling_min(self, column, window):
+        return self._memoize(('rolling_min', column, window),
+                             lambda: self._rolling(self.columns[column], window, lambda w: w.min(axis=1)))
+
+    def _rolling_max(self, column, window):
+        return self._memoize(('rolling_max', column, window),
+                             lambda: self._rolling(self.columns[column], window, lambda w: w.max(axis=1)))
+
+    def _ewm(self, values, span):
+        """
+        EWM with adjust=False restarted at every symbol. One pass runs over the whole panel, then the carry-over
+        from the previous symbol, which decays by (1 - alpha) per row, is subtracted from each symbol.
+        """
+        if len(values) == 0:
+            return np.empty(0)
+        decay = 1 - 2 / (span + 1)
+        result = pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+        starts = self.starts[1:][self.lengths[1:] > 0]
+        carry = np.zeros(len(values))
+        carry[starts] = decay * (result[starts - 1] - values[starts])
+        carry = np.repeat(carry[np.concatenate([[0], starts])], np.diff(np.concatenate([[0], starts, [len(values)]])))
+        return result - carry * decay ** self.positions
+
+    def _ewm_mean(self, column, span):
+        return self._memoize(('ewm_mean', column, span), lambda: self._ewm(self.columns[column], span))
+
+    def _diff(self, column):
+        def compute():
+            values = self.columns[column]
+            delta = np.empty(len(values))
+            delta[1:] = values[1:] - values[:-1]
+            delta[self.positions == 0] = np.nan
+            return delta
+
+        return self._memoize(('diff', column), compute)
+
+    def bollinger_bands(self):
+        window = self.window
+        num_std_dev = self.bb_params['num_std_dev']
+
+        def compute():
+            sma = self._rolling_mean('close', window)
+            std = self._rolling_std('close', window)
+            return sma - (std * num_std_dev), sma + (std * num_std_dev)
+
+        return self._memoize(('bb', window, num_std_dev), compute)
+
+    def vwap(self):
+        def compute():
+            volume = self.columns['volume']
+            cumulative_volume = np.cumsum(volume)
+            # restart the running volume at the first row of every symbol
+            offsets = np.repeat(cumulative_volume[self.starts] - volume[self.starts], self.lengths)
+            return self.columns['close'] * volume / (cumulative_volume - offsets)
+
+        return self._memoize(('vwap',), compute)
+
+    def macd(self):
+        short_window = self.macd_params['short_window']
+        long_window = self.macd_params['long_window']
+        signal_window = self.macd_params['signal_window']
+
+        def compute():
+            macd_line = self._ewm_mean('close', short_window) - self._ewm_mean('close', long_window)
+            return macd_line, self._ewm(macd_line, signal_window)
+
+        return self._memoize(('macd', short_window, long_window, signal_window), compute)
+
+    def rsi(self, period=14):
+        def compute():
+            delta = self._diff('close')
+            gain = self._rolling(np.where(delta > 0, delta, 0.0), period, lambda w: w.mean(axis=1))
+            loss = self._rolling(np.where(delta < 0, -delta, 0.0), period, lambda w: w.mean(axis=1))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return 100 - (100 / (1 + gain / loss))
+
+        return self._memoize(('rsi', period), compute)
+
+    def stochastic_oscillator(self, k_period=14, d_period=3):
+        def compute():
+            low_min = self._rolling_min('low', k_period)
+            high_max = self._rolling_max('high', k_period)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                k_line = 100 * ((self.columns['close'] - low_min) / (high_max - low_min))
+            d_line = self._rolling(k_line, d_period, lambda w: w.mean(axis=1))
+            return k_line, d_line
+
+        return self._memoize(('stoch', k_period, d_period), compute)
+
+    def simple_moving_average(self):
+        return self._rolling_mean('close', self.window)
+
+    def exponential_moving_average(self):
+        return self._ewm_mean('close', self.window)
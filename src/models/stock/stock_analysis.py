@@ -3,9 +3,13 @@ from src.utils.stock_logger import StockLogger
 
 
 class StockAnalysis:
-    def __init__(self, df, indicators_list):
+    def __init__(self, df, indicators_list, indicators=None):
+        """
+        :param indicators: Optional object with the latest / is_macd_positive interface of Indicators, such as
+            StreamingIndicators kept up to date with df. Defaults to Indicators over df.
+        """
         self.df = df
-        self.indicators = Indicators(df)
+        self.indicators = indicators or Indicators(df)
         self.indicators_list = indicators_list
         self.logger = StockLogger("StockAnalysis")
 
@@ -14,20 +18,20 @@ class StockAnalysis:
 
     def calculate_trend_strength(self):
         vwap_signal = 'vwap' in self.indicators_list and self.df['close'].iloc[-1] < \
-                      self.indicators.vwap().iloc[-1]
+                      self.indicators.latest('vwap')
         macd_signal = 'macd' in self.indicators_list and self.indicators.is_macd_positive()
         return vwap_signal + macd_signal
 
     def calculate_target_prices(self, trade_signal):
         lower_band, upper_band = None, None
         if 'bb' in self.indicators_list:
-            lower_band, upper_band = self.indicators.bollinger_bands()
+            lower_band, upper_band = self.indicators.latest('bb')
 
         if trade_signal in ['strong_buy', 'weak_buy']:
-            target_buy_price = lower_band.iloc[-1] if lower_band is not None else None
+            target_buy_price = lower_band
             return target_buy_price, None
         elif trade_signal in ['strong_sell', 'weak_sell']:
-            target_sell_price = upper_band.iloc[-1] if upper_band is not None else None
+            target_sell_price = upper_band
             return None, target_sell_price
         return None, None
 
@@ -52,15 +56,15 @@ class StockAnalysis:
 
         # Bollinger Bands
         if 'bb' in self.indicators_list:
-            lower_band, upper_band = self.indicators.bollinger_bands()
-            if self.df['close'].iloc[-1] < lower_band.iloc[-1]:
+            lower_band, upper_band = self.indicators.latest('bb')
+            if self.df['close'].iloc[-1] < lower_band:
                 signals['buy'] += 1
-            if self.df['close'].iloc[-1] > upper_band.iloc[-1]:
+            if self.df['close'].iloc[-1] > upper_band:
                 signals['sell'] += 1
 
         # VWAP
         if 'vwap' in self.indicators_list:
-            vwap = self.indicators.vwap().iloc[-1]
+            vwap = self.indicators.latest('vwap')
             if self.df['close'].iloc[-1] < vwap:
                 signals['buy'] += 1
             if self.df['close'].iloc[-1] > vwap:
@@ -75,7 +79,7 @@ class StockAnalysis:
 
                 # RSI
         if 'rsi' in self.indicators_list:
-            rsi = self.indicators.rsi().iloc[-1]
+            rsi = self.indicators.latest('rsi')
             if rsi < 30:
                 signals['buy'] += 1
             if rsi > 70:
@@ -83,21 +87,21 @@ class StockAnalysis:
 
         # Stochastic Oscillator
         if 'stoch' in self.indicators_list:
-            k_line, d_line = self.indicators.stochastic_oscillator()
-            if k_line.iloc[-1] < 20 or d_line.iloc[-1] < 20:
+            k_line, d_line = self.indicators.latest('stoch')
+            if k_line < 20 or d_line < 20:
                 signals['buy'] += 1
-            if k_line.iloc[-1] > 80 or d_line.iloc[-1] > 80:
+            if k_line > 80 or d_line > 80:
                 signals['sell'] += 1
 
         if 'ema' in self.indicators_list:
-            ema = self.indicators.exponential_moving_average().iloc[-1]
+            ema = self.indicators.latest('ema')
             if self.df['close'].iloc[-1] < ema:
                 signals['buy'] += 1
             if self.df['close'].iloc[-1] > ema:
                 signals['sell'] += 1
 
         if 'sma' in self.indicators_list:
-            sma = self.indicators.simple_moving_average().iloc[-1]
+            sma = self.indicators.latest('sma')
             if self.df['close'].iloc[-1] < sma:
                 signals['buy'] += 1
             if self.df['close'].iloc[-1] > sma:
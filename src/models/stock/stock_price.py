@@ -1,6 +1,24 @@
 from alpaca.data import TimeFrameUnit
 from src.utils.utils import get_uuid_as_str
 
+# column order of StockPrice.to_dict, which positional lookups on price frames depend on
+stock_price_columns = ['id', 'symbol', 'timestamp', 'timeframe_unit', 'open', 'high', 'low', 'close', 'volume',
+                       'vwap', 'trade_count']
+# column order of the StockPrice constructor, which is also the row order returned by stock.get_stock_prices
+stock_price_record_columns = ['symbol', 'timeframe_unit', 'timestamp', 'open', 'high', 'low', 'close', 'volume',
+                              'vwap', 'trade_count', 'id']
+
+
+def normalize_timeframe_unit(timeframe_unit):
+    if isinstance(timeframe_unit, TimeFrameUnit):
+        return timeframe_unit
+    if timeframe_unit.lower() == 'minute' or timeframe_unit.lower() == 'min':
+        return TimeFrameUnit.Minute
+    elif timeframe_unit.lower() == 'hour':
+        return TimeFrameUnit.Hour
+    else:
+        return TimeFrameUnit.Day
+
 
 class StockPrice:
     def __init__(self, symbol: str, timeframe_unit: str, timestamp: str,
@@ -17,12 +35,7 @@ class StockPrice:
         self.volume = volume
         self.vwap = vwap
         self.trade_count = trade_count
-        if timeframe_unit.lower() == 'minute' or timeframe_unit.lower() == 'min':
-            self.timeframe_unit = TimeFrameUnit.Minute
-        elif timeframe_unit.lower() == 'hour':
-            self.timeframe_unit = TimeFrameUnit.Hour
-        else:
-            self.timeframe_unit = TimeFrameUnit.Day
+        self.timeframe_unit = normalize_timeframe_unit(timeframe_unit)
 
     @classmethod
     def from_alpaca_bar_deprecated(cls, symbol, bar, timeframe_unit):
@@ -0,0 +1,238 @@
+import numpy as np
+import pandas as pd
+
+from src.models.stock.stock_price import stock_price_columns, stock_price_record_columns, normalize_timeframe_unit
+from src.utils.utils import get_uuids_as_str, format_utc_timestamps
+
+# order of the columns in StockPriceBatch.prices
+price_columns = ['open', 'high', 'low', 'close', 'volume', 'vwap', 'trade_count']
+
+
+class StockPriceBatch:
+    """
+    Columnar replacement for lists of StockPrice objects.
+
+    Rows are kept sorted by symbol and then timestamp so every symbol is a contiguous slice. Symbols are stored
+    once in a dictionary and referenced by int32 codes, timestamps are int64 UTC epoch nanoseconds and the price
+    columns share one float64 (rows, 7) array, which lets to_frame hand pandas the block without copying it.
+    Row ids are only generated the first time they are needed, and slices share them with the batch they came from.
+    """
+
+    def __init__(self, symbols, symbol_codes, timestamps, prices, timeframe_unit, ids=None, parent=None):
+        """
+        :param symbols: Dictionary of symbols referenced by symbol_codes.
+        :param symbol_codes: int32 array, index into symbols for each row.
+        :param timestamps: int64 array of UTC epoch nanoseconds.
+        :param prices: float64 array of shape (rows, len(price_columns)).
+        :param timeframe_unit: Timeframe unit shared by every row.
+        :param ids: Optional array of row ids.
+        :param parent: (batch, start, stop) when this batch is a slice of another one.
+        """
+        self.symbols = np.asarray(symbols, dtype=object)
+        self.symbol_codes = symbol_codes
+        self.timestamps = timestamps
+        self.prices = prices
+        self.timeframe_unit = normalize_timeframe_unit(timeframe_unit).value
+        self._ids = ids
+        self._parent = parent
+        self._symbol_bounds = None
+
+    @classmethod
+    def empty(cls, timeframe_unit='Min'):
+        return cls([], np.empty(0, dtype='int32'), np.empty(0, dtype='int64'),
+                   np.empty((0, len(price_columns)), dtype='float64'), timeframe_unit)
+
+    @classmethod
+    def _from_columns(cls, symbols, timestamps, price_arrays, timeframe_unit, ids=None):
+        """
+        Builds a sorted batch from row-aligned column arrays.
+        """
+        if len(timestamps) == 0:
+            return cls.empty(timeframe_unit)
+
+        symbol_codes, symbol_dictionary = pd.factorize(np.asarray(symbols, dtype=object), sort=True)
+        symbol_codes = symbol_codes.astype('int32')
+        timestamps = np.asarray(timestamps, dtype='int64')
+        prices = np.column_stack([np.asarray(price_arrays[column], dtype='float64') for column in price_columns])
+
+        order = np.lexsort((timestamps, symbol_codes))
+        if np.any(order != np.arange(len(order))):
+            symbol_codes, timestamps, prices = symbol_codes[order], timestamps[order], prices[order]
+            ids = np.asarray(ids, dtype=object)[order] if ids is not None else None
+
+        return cls(symbol_dictionary, symbol_codes, timestamps, np.ascontiguousarray(prices), timeframe_unit,
+                   ids=np.asarray(ids, dtype=object) if ids is not None else None)
+
+    @classmethod
+    def from_bar_frame(cls, bars_df, timeframe_unit, stock_filter=None):
+        """
+        Vectorized conversion of alpaca bars.
+
+        :param bars_df: DataFrame of alpaca bars indexed by (symbol, timestamp).
+        :param timeframe_unit: Timeframe unit of the bars.
+        :param stock_filter: Optional Filter applied to close and volume as a boolean mask.
+        """
+        if stock_filter is not None:
+            bars_df = bars_df[stock_filter.mask(bars_df['close'].to_numpy(), bars_df['volume'].to_numpy())]
+
+        timestamps = pd.DatetimeIndex(bars_df.index.get_level_values('timestamp')).tz_convert('UTC')
+        return cls._from_columns(bars_df.index.get_level_values('symbol'), timestamps.as_unit('ns').asi8,
+                                 bars_df, timeframe_unit)
+
+    @classmethod
+    def from_frame(cls, stock_price_df, timeframe_unit=None):
+        """
+        Builds a batch from a DataFrame with the columns of StockPrice.to_dict.
+        """
+        if len(stock_price_df) == 0:
+            return cls.empty(timeframe_unit or 'Min')
+
+        timeframe_unit = timeframe_unit or stock_price_df['timeframe_unit'].iloc[0]
+        timestamps = pd.DatetimeIndex(pd.to_datetime(stock_price_df['timestamp'], utc=True))
+        ids = stock_price_df['id'].astype(str).to_numpy(dtype=object) if 'id' in stock_price_df else None
+        return cls._from_columns(stock_price_df['symbol'].to_numpy(dtype=object), timestamps.as_unit('ns').asi8,
+                                 stock_price_df, timeframe_unit, ids=ids)
+
+    @classmethod
+    def from_records(cls, records, timeframe_unit=None):
+        """
+        Builds a batch from rows in StockPrice constructor order, as returned by stock.get_stock_prices.
+        """
+        return cls.from_frame(pd.DataFrame.from_records(records, columns=stock_price_record_columns), timeframe_unit)
+
+    @classmethod
+    def from_stock_prices(cls, stock_prices):
+        return cls.from_frame(pd.DataFrame([stock_price.to_dict() for stock_price in stock_prices],
+                                           columns=stock_price_columns))
+
+    @classmethod
+    def concat(cls, batches):
+        batches = [batch for batch in batches if len(batch) > 0]
+        if not batches:
+            return cls.empty()
+
+        timeframe_unit = batches[0].timeframe_unit
+        prices = np.concatenate([batch.prices for batch in batches])
+        ids = None
+        if any(batch.has_ids() for batch in batches):
+            ids = np.concatenate([batch.ids for batch in batches])
+        return cls._from_columns(np.concatenate([batch.symbols[batch.symbol_codes] for batch in batches]),
+                                 np.concatenate([batch.timestamps for batch in batches]),
+                                 {column: prices[:, i] for i, column in enumerate(price_columns)}, timeframe_unit,
+                                 ids=ids)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, item):
+        """
+        Slicing returns a view that shares its arrays and row ids with this batch.
+        """
+        if not isinstance(item, slice) or item.step not in (None, 1):
+            raise TypeError("StockPriceBatch only supports contiguous slices")
+        start, stop, _ = item.indices(len(self))
+        return StockPriceBatch(self.symbols, self.symbol_codes[start:stop], self.timestamps[start:stop],
+                               self.prices[start:stop], self.timeframe_unit, parent=(self, start, stop))
+
+    def __repr__(self):
+        return f"StockPriceBatch(rows={len(self)}, symbols={len(self.unique_symbols)}, " \
+               f"timeframe_unit='{self.timeframe_unit}')"
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            if self._parent is not None:
+                parent, start, stop = self._parent
+                self._ids = parent.ids[start:stop]
+            else:
+                self._ids = get_uuids_as_str(len(self))
+        return self._ids
+
+    def has_ids(self):
+        """
+        :return: Whether row ids already exist, so copies of these rows must carry them over.
+        """
+        if self._ids is not None:
+            return True
+        return self._parent is not None and self._parent[0].has_ids()
+
+    @property
+    def nbytes(self):
+        return self.symbol_codes.nbytes + self.timestamps.nbytes + self.prices.nbytes
+
+    @property
+    def unique_symbols(self):
+        return list(self._get_symbol_bounds().keys())
+
+    def column(self, name):
+        """
+        :return: View of a single price column.
+        """
+        return self.prices[:, price_columns.index(name)]
+
+    def _get_symbol_bounds(self):
+        if self._symbol_bounds is None:
+            change_points = np.flatnonzero(np.diff(self.symbol_codes)) + 1
+            starts = np.concatenate([[0], change_points]) if len(self) > 0 else np.empty(0, dtype='int64')
+            stops = np.concatenate([change_points, [len(self)]]) if len(self) > 0 else np.empty(0, dtype='int64')
+            self._symbol_bounds = {self.symbols[self.symbol_codes[start]]: (int(start), int(stop))
+                                   for start, stop in zip(starts, stops)}
+        return self._symbol_bounds
+
+    def for_symbol(self, symbol):
+        start, stop = self._get_symbol_bounds().get(symbol, (0, 0))
+        return self[start:stop]
+
+    def iter_symbols(self):
+        for symbol, (start, stop) in self._get_symbol_bounds().items():
+            yield symbol, self[start:stop]
+
+    def filter(self, stock_filter):
+        """
+        :return: New batch with only the rows that pass the filter's price and volume checks.
+        """
+        mask = np.asarray(stock_filter.mask(self.column('close'), self.column('volume')))
+        symbols = self.symbols[self.symbol_codes[mask]]
+        prices = self.prices[mask]
+        return StockPriceBatch._from_columns(symbols, self.timestamps[mask],
+                                             {column: prices[:, i] for i, column in enumerate(price_columns)},
+                                             self.timeframe_unit, ids=self.ids[mask] if self.has_ids() else None)
+
+    def to_frame(self, ascending=True):
+        """
+        DataFrame with the columns of StockPrice.to_dict. The price columns are a view of this batch's price array
+        and timestamps are tz-aware UTC datetimes.
+
+        :param ascending: Row order by timestamp within each symbol.
+        """
+        stock_price_df = pd.DataFrame(self.prices, columns=price_columns, copy=False)
+        stock_price_df.insert(0, 'id', self.ids)
+        stock_price_df.insert(1, 'symbol', self.symbols[self.symbol_codes])
+        stock_price_df.insert(2, 'timestamp', pd.DatetimeIndex(self.timestamps.view('datetime64[ns]'), tz='UTC'))
+        stock_price_df.insert(3, 'timeframe_unit', self.timeframe_unit)
+        if not ascending:
+            stock_price_df = stock_price_df.iloc[::-1].reset_index(drop=True)
+        return stock_price_df
+
+    def to_frames(self, ascending=False):
+        """
+        One DataFrame per symbol, most recent timestamp first by default.
+        """
+        return [symbol_batch.to_frame(ascending=ascending) for _, symbol_batch in self.iter_symbols()]
+
+    def iter_rows(self, chunk_size=10000):
+        """
+        Yields rows as tuples in StockPrice.to_dict column order, materializing at most chunk_size rows at a time.
+        """
+        for start in range(0, len(self), chunk_size):
+            chunk = self[start:start + chunk_size]
+            columns = [chunk.ids, chunk.symbols[chunk.symbol_codes], format_utc_timestamps(chunk.timestamps),
+                       [chunk.timeframe_unit] * len(chunk)] + [chunk.prices[:, i].tolist()
+                                                               for i in range(len(price_columns))]
+            yield from zip(*columns)
+
+    def to_dicts(self):
+        """
+        :return: List of dictionaries matching StockPrice.to_dict, for the json insert procs.
+        """
+        return [dict(zip(stock_price_columns, row)) for row in self.iter_rows()]
@@ -0,0 +1,427 @@
+import json
+import math
+import os
+from collections import deque
+
+import pandas as pd
+
+from src.constants import global_bb_params, global_macd_params, global_indicators_window, \
+    global_streaming_indicators_state_dir
+from src.models.stock.indicators import IndicatorsEnum
+from src.utils.file_manager import relative_path, create_dir_if_not_exists
+from src.utils.stock_logger import StockLogger
+
+
+class RollingStats:
+    """
+    Rolling mean and sample standard deviation over the last window values, updated in O(1) per value with
+    Welford's add/remove steps. The running sums are rebuilt from the window every resync_every updates so
+    floating point drift cannot build up over a long session.
+    """
+    resync_every = 10000
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.updates = 0
+
+    def update(self, value):
+        self.values.append(value)
+        delta = value - self.mean
+        self.mean += delta / len(self.values)
+        self.m2 += delta * (value - self.mean)
+
+        if len(self.values) > self.window:
+            removed = self.values.popleft()
+            delta = removed - self.mean
+            self.mean -= delta / len(self.values)
+            self.m2 -= delta * (removed - self.mean)
+
+        self.updates += 1
+        if self.updates % self.resync_every == 0:
+            self._resync()
+
+    def _resync(self):
+        count = len(self.values)
+        self.mean = math.fsum(self.values) / count
+        self.m2 = math.fsum((value - self.mean) ** 2 for value in self.values)
+
+    @property
+    def ready(self):
+        return len(self.values) >= self.window
+
+    @property
+    def std(self):
+        return math.sqrt(max(self.m2, 0.0) / (len(self.values) - 1)) if len(self.values) > 1 else math.nan
+
+    def to_state(self):
+        return {'window': self.window, 'values': list(self.values), 'updates': self.updates}
+
+    @classmethod
+    def from_state(cls, state):
+        rolling_stats = cls(state['window'])
+        rolling_stats.values = deque(state['values'])
+        rolling_stats.updates = state['updates']
+        if rolling_stats.values:
+            rolling_stats._resync()
+        return rolling_stats
+
+
+class StreamingEma:
+    """
+    Recursive EMA matching pandas ewm(span, adjust=False): seeded with the first value.
+    """
+
+    def __init__(self, span):
+        self.span = span
+        self.alpha = 2 / (span + 1)
+        self.value = None
+
+    def update(self, value):
+        self.value = value if self.value is None else self.value + self.alpha * (value - self.value)
+        return self.value
+
+    def to_state(self):
+        return {'span': self.span, 'value': self.value}
+
+    @classmethod
+    def from_state(cls, state):
+        ema = cls(state['span'])
+        ema.value = state['value']
+        return ema
+
+
+class StreamingBollingerBands:
+    def __init__(self, window=global_indicators_window, num_std_dev=global_bb_params['num_std_dev']):
+        self.num_std_dev = num_std_dev
+        self.stats = RollingStats(window)
+
+    def update(self, close):
+        self.stats.update(close)
+
+    def latest(self):
+        """
+        :return: (lower, upper), NaN until the window is full.
+        """
+        if not self.stats.ready:
+            return math.nan, math.nan
+        band = self.stats.std * self.num_std_dev
+        return self.stats.mean - band, self.stats.mean + band
+
+    def to_state(self):
+        return {'num_std_dev': self.num_std_dev, 'stats': self.stats.to_state()}
+
+    @classmethod
+    def from_state(cls, state):
+        bollinger_bands = cls(state['stats']['window'], state['num_std_dev'])
+        bollinger_bands.stats = RollingStats.from_state(state['stats'])
+        return bollinger_bands
+
+
+class StreamingMacd:
+    def __init__(self, short_window=12, long_window=26, signal_window=9):
+        self.short_ema = StreamingEma(short_window)
+        self.long_ema = StreamingEma(long_window)
+        self.signal_ema = StreamingEma(signal_window)
+        self.macd_line = None
+
+    def update(self, close):
+        self.macd_line = self.short_ema.update(close) - self.long_ema.update(close)
+        self.signal_ema.update(self.macd_line)
+
+    def latest(self):
+        """
+        :return: (macd line, signal line)
+        """
+        return self.macd_line, self.signal_ema.value
+
+    def to_state(self):
+        return {'short_ema': self.short_ema.to_state(), 'long_ema': self.long_ema.to_state(),
+                'signal_ema': self.signal_ema.to_state(), 'macd_line': self.macd_line}
+
+    @classmethod
+    def from_state(cls, state):
+        macd = cls()
+        macd.short_ema = StreamingEma.from_state(state['short_ema'])
+        macd.long_ema = StreamingEma.from_state(state['long_ema'])
+        macd.signal_ema = StreamingEma.from_state(state['signal_ema'])
+        macd.macd_line = state['macd_line']
+        return macd
+
+
+class StreamingRsi:
+    """
+    RSI over the last period close-to-close changes.
+
+    By default gains and losses are averaged over a sliding window, which matches Indicators.rsi. With wilder=True
+    they are smoothed recursively with alpha 1 / period instead, seeded with the first full window's averages.
+    """
+
+    def __init__(self, period=14, wilder=False):
+        self.period = period
+        self.wilder = wilder
+        self.previous_close = None
+        self.changes = deque()
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+        self.average_gain = None
+        self.average_loss = None
+
+    def update(self, close):
+        # like the diff in Indicators.rsi, the first bar counts as a change of zero
+        change = 0.0 if self.previous_close is None else close - self.previous_close
+        self.previous_close = close
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+
+        if self.wilder and self.average_gain is not None:
+            self.average_gain += (gain - self.average_gain) / self.period
+            self.average_loss += (loss - self.average_loss) / self.period
+            return
+
+        self.changes.append(change)
+        self.gain_sum += gain
+        self.loss_sum += loss
+        if len(self.changes) > self.period:
+            removed = self.changes.popleft()
+            self.gain_sum -= max(removed, 0.0)
+            self.loss_sum -= max(-removed, 0.0)
+        if len(self.changes) == self.period:
+            self.average_gain = max(self.gain_sum, 0.0) / self.period
+            self.average_loss = max(self.loss_sum, 0.0) / self.period
+
+    def latest(self):
+        if self.average_gain is None:
+            return math.nan
+        if self.average_loss == 0:
+            return 100.0 if self.average_gain > 0 else math.nan
+        return 100 - (100 / (1 + self.average_gain / self.average_loss))
+
+    def to_state(self):
+        return {'period': self.period, 'wilder': self.wilder, 'previous_close': self.previous_close,
+                'changes': list(self.changes), 'average_gain': self.average_gain,
+                'average_loss': self.average_loss}
+
+    @classmethod
+    def from_state(cls, state):
+        rsi = cls(state['period'], state['wilder'])
+        rsi.previous_close = state['previous_close']
+        rsi.changes = deque(state['changes'])
+        rsi.gain_sum = math.fsum(max(change, 0.0) for change in rsi.changes)
+        rsi.loss_sum = math.fsum(max(-change, 0.0) for change in rsi.changes)
+        rsi.average_gain = state['average_gain']
+        rsi.average_loss = state['average_loss']
+        return rsi
+
+
+class StreamingVwap:
+    """
+    Keeps the cumulative volume used by Indicators.vwap, latest close * volume over all volume so far.
+    """
+
+    def __init__(self):
+        self.cumulative_volume = 0.0
+        self.last_price_volume = math.nan
+
+    def update(self, close, volume):
+        self.cumulative_volume += volume
+        self.last_price_volume = close * volume
+
+    def latest(self):
+        return self.last_price_volume / self.cumulative_volume if self.cumulative_volume else math.nan
+
+    def to_state(self):
+        return {'cumulative_volume': self.cumulative_volume, 'last_price_volume': self.last_price_volume}
+
+    @classmethod
+    def from_state(cls, state):
+        vwap = cls()
+        vwap.cumulative_volume = state['cumulative_volume']
+        vwap.last_price_volume = state['last_price_volume']
+        return vwap
+
+
+class StreamingStochastic:
+    """
+    Stochastic oscillator with the k_period low/high tracked by monotonic deques of (bar index, value), so every
+    update is amortized O(1), and %D kept as a running sum of the last d_period %K values.
+    """
+
+    def __init__(self, k_period=14, d_period=3):
+        self.k_period = k_period
+        self.d_period = d_period
+        self.index = 0
+        self.lows = deque()
+        self.highs = deque()
+        self.k_values = deque()
+        self.k_sum = math.nan
+        self.k_line = math.nan
+
+    def update(self, high, low, close):
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append((self.index, low))
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append((self.index, high))
+
+        oldest_index = self.index - self.k_period + 1
+        while self.lows[0][0] < oldest_index:
+            self.lows.popleft()
+        while self.highs[0][0] < oldest_index:
+            self.highs.popleft()
+        self.index += 1
+
+        if self.index < self.k_period:
+            return
+        low_min, high_max = self.lows[0][1], self.highs[0][1]
+        self.k_line = 100 * (close - low_min) / (high_max - low_min) if high_max != low_min else math.nan
+
+        self.k_values.append(self.k_line)
+        if len(self.k_values) > self.d_period:
+            self.k_values.popleft()
+        self.k_sum = math.fsum(self.k_values)
+
+    def latest(self):
+        """
+        :return: (%K, %D)
+        """
+        d_line = self.k_sum / self.d_period if len(self.k_values) == self.d_period else math.nan
+        return self.k_line, d_line
+
+    def to_state(self):
+        return {'k_period': self.k_period, 'd_period': self.d_period, 'index': self.index,
+                'lows': [list(item) for item in self.lows], 'highs': [list(item) for item in self.highs],
+                'k_values': list(self.k_values), 'k_line': self.k_line}
+
+    @classmethod
+    def from_state(cls, state):
+        stochastic = cls(state['k_period'], state['d_period'])
+        stochastic.index = state['index']
+        stochastic.lows = deque(tuple(item) for item in state['lows'])
+        stochastic.highs = deque(tuple(item) for item in state['highs'])
+        stochastic.k_values = deque(state['k_values'])
+        stochastic.k_sum = math.fsum(stochastic.k_values)
+        stochastic.k_line = state['k_line']
+        return stochastic
+
+
+class StreamingIndicators:
+    """
+    Online counterpart of Indicators for one symbol. Each new bar updates every indicator in constant time and
+    latest() has the same interface as Indicators.latest, so StockAnalysis can use either.
+
+    These feed the rule based signals. Model features come from prepare_features, which applies the feature version
+    and cleaning the models were trained with.
+
+    :param last_timestamp: Timestamp of the last bar applied, bars at or before it are skipped by update_from_frame.
+    """
+
+    logger = StockLogger("StreamingIndicators")
+
+    def __init__(self, bb_params=global_bb_params, macd_params=global_macd_params, window=global_indicators_window):
+        window = window or 20
+        self.indicators = {
+            IndicatorsEnum.BB.value: StreamingBollingerBands(window, bb_params['num_std_dev']),
+            IndicatorsEnum.SMA.value: RollingStats(window),
+            IndicatorsEnum.EMA.value: StreamingEma(window),
+            IndicatorsEnum.MACD.value: StreamingMacd(macd_params['short_window'], macd_params['long_window'],
+                                                     macd_params['signal_window']),
+            IndicatorsEnum.RSI.value: StreamingRsi(),
+            IndicatorsEnum.VWAP.value: StreamingVwap(),
+            IndicatorsEnum.STOCH.value: StreamingStochastic(),
+        }
+        self.last_timestamp = None
+
+    def update(self, close, high, low, volume):
+        """
+        Applies one bar to every indicator.
+        """
+        indicators = self.indicators
+        indicators[IndicatorsEnum.BB.value].update(close)
+        indicators[IndicatorsEnum.SMA.value].update(close)
+        indicators[IndicatorsEnum.EMA.value].update(close)
+        indicators[IndicatorsEnum.MACD.value].update(close)
+        indicators[IndicatorsEnum.RSI.value].update(close)
+        indicators[IndicatorsEnum.VWAP.value].update(close, volume)
+        indicators[IndicatorsEnum.STOCH.value].update(high, low, close)
+
+    def update_from_frame(self, stock_price_df):
+        """
+        Applies the bars of a frame sorted by ascending timestamp that are newer than the last bar seen.
+
+        :return: Number of bars applied.
+        """
+        if self.last_timestamp is not None:
+            stock_price_df = stock_price_df[stock_price_df['timestamp'] > self.last_timestamp]
+        if len(stock_price_df) == 0:
+            return 0
+
+        for close, high, low, volume in zip(stock_price_df['close'].to_numpy(), stock_price_df['high'].to_numpy(),
+                                            stock_price_df['low'].to_numpy(), stock_price_df['volume'].to_numpy()):
+            self.update(float(close), float(high), float(low), float(volume))
+        self.last_timestamp = stock_price_df['timestamp'].iloc[-1]
+        return len(stock_price_df)
+
+    def latest(self, name):
+        """
+        Last value of an indicator, see Indicators.latest for the tuple layouts.
+        """
+        indicator = self.indicators[name]
+        if name == IndicatorsEnum.SMA.value:
+            return indicator.mean if indicator.ready else math.nan
+        if name == IndicatorsEnum.EMA.value:
+            return indicator.value
+        return indicator.latest()
+
+    def is_macd_positive(self):
+        macd_line, signal_line = self.latest(IndicatorsEnum.MACD.value)
+        return macd_line > signal_line
+
+    def to_state(self):
+        return {'last_timestamp': None if self.last_timestamp is None else str(self.last_timestamp),
+                'indicators': {name: indicator.to_state() for name, indicator in self.indicators.items()}}
+
+    @classmethod
+    def from_state(cls, state):
+        streaming_indicators = cls()
+        indicator_classes = {
+            IndicatorsEnum.BB.value: StreamingBollingerBands,
+            IndicatorsEnum.SMA.value: RollingStats,
+            IndicatorsEnum.EMA.value: StreamingEma,
+            IndicatorsEnum.MACD.value: StreamingMacd,
+            IndicatorsEnum.RSI.value: StreamingRsi,
+            IndicatorsEnum.VWAP.value: StreamingVwap,
+            IndicatorsEnum.STOCH.value: StreamingStochastic,
+        }
+        streaming_indicators.indicators = {name: indicator_classes[name].from_state(indicator_state)
+                                           for name, indicator_state in state['indicators'].items()}
+        if state['last_timestamp'] is not None:
+            streaming_indicators.last_timestamp = pd.Timestamp(state['last_timestamp'])
+        return streaming_indicators
+
+    def save(self, symbol, state_dir=global_streaming_indicators_state_dir):
+        """
+        Saves the state for the next run. A read only project root (e.g. on lambda) only costs the resume.
+        """
+        path = os.path.join(relative_path, state_dir)
+        file_path = os.path.join(path, f"{symbol}.json")
+        try:
+            create_dir_if_not_exists(path)
+            with open(f"{file_path}.tmp", 'w') as state_file:
+                json.dump(self.to_state(), state_file)
+            os.replace(f"{file_path}.tmp", file_path)
+        except OSError as e:
+            self.logger.log_error(e, f"Error saving streaming indicators to {file_path}", False)
+
+    @classmethod
+    def load(cls, symbol, state_dir=global_streaming_indicators_state_dir):
+        """
+        :return: The saved indicators for symbol, or None when there is no saved state.
+        """
+        file_path = os.path.join(relative_path, state_dir, f"{symbol}.json")
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, 'r') as state_file:
+            return cls.from_state(json.load(state_file))
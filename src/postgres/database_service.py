@@ -1,52 +1,199 @@
+import csv
+import io
 import json
 import pickle
+import threading
+import time
+from contextlib import contextmanager
 
+import pandas as pd
 import psycopg2
 from psycopg2._json import Json
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import ThreadedConnectionPool
 from src.config.config_manager import ConfigManager
+from src.constants import global_db_pool_health_check_seconds, global_db_stream_itersize
 from src.utils.stock_logger import StockLogger
 
 
+# pandas dtypes for postgres type oids, integers are nullable so NULLs do not force a float or object column
+pg_oid_dtypes = {
+    16: 'boolean',
+    20: 'Int64',
+    21: 'Int16',
+    23: 'Int32',
+    700: 'float32',
+    701: 'float64',
+    1700: 'float64',
+}
+pg_oid_datetimes = {1082, 1114, 1184}
+
+
+class CsvRowStream(io.TextIOBase):
+    """
+    Read-only file object that renders an iterable of row tuples as CSV on demand, so COPY can stream any number of
+    rows while only one buffer's worth is held in memory.
+    """
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.row_count = 0
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self.row_count += 1
+            if self._buffer.tell() >= 65536:
+                self._pending += self._buffer.getvalue()
+                self._buffer.seek(0)
+                self._buffer.truncate()
+        self._pending += self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+        if size < 0:
+            chunk, self._pending = self._pending, ''
+        else:
+            chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
 class DatabaseService:
+    """
+    Process-wide access to Postgres through a thread-safe connection pool.
+
+    Each thread checks out its own connection with get_connection. Checkouts are re-entrant within a thread, block
+    while the pool is exhausted and replace connections that are closed or fail a health check.
+    """
     logger = StockLogger("DatabaseService")
 
     _instance = None
-    connection = None
+    _instance_lock = threading.Lock()
+    pool = None
 
     def __new__(cls):
-        pg_configs = ConfigManager().get_postgres_config()
-        if cls._instance is None:
-            cls._instance = super(DatabaseService, cls).__new__(cls)
-            cls._instance.dbname = pg_configs.dbname
-            cls._instance.user = pg_configs.user
-            cls._instance.password = pg_configs.password
-            cls._instance.host = pg_configs.host
-            cls._instance.port = pg_configs.port
-            cls._instance.connect()
+        with cls._instance_lock:
+            if cls._instance is None:
+                pg_configs = ConfigManager().get_postgres_config()
+                cls._instance = super(DatabaseService, cls).__new__(cls)
+                cls._instance.dbname = pg_configs.dbname
+                cls._instance.user = pg_configs.user
+                cls._instance.password = pg_configs.password
+                cls._instance.host = pg_configs.host
+                cls._instance.port = pg_configs.port
+                cls._instance.pool_min_size = pg_configs.pool_min_size
+                cls._instance.pool_max_size = pg_configs.pool_max_size
+                cls._instance._pool_lock = threading.Lock()
+                cls._instance._local = threading.local()
+                cls._instance._last_used = {}
+                # proc_name -> result column names, learned once by read_columns
+                cls._instance._result_columns = {}
+                cls._instance._slots = threading.BoundedSemaphore(pg_configs.pool_max_size)
+                cls._instance.connect()
         return cls._instance
 
     def connect(self):
-        """Connect to the PostgreSQL database server."""
-        if self.connection is not None:
-            return
-        try:
-            conn = psycopg2.connect(
-                dbname=self.dbname,
-                user=self.user,
-                password=self.password,
-                host=self.host,
-                port=self.port
-            )
-            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-            self.connection = conn
-        except (Exception, psycopg2.DatabaseError) as error:
-            self.logger.log_error(error, f"Error connecting to {self.dbname} database", True)
+        """Open the connection pool to the PostgreSQL database server."""
+        with self._pool_lock:
+            if self.pool is not None:
+                return
+            try:
+                self.pool = ThreadedConnectionPool(
+                    self.pool_min_size,
+                    self.pool_max_size,
+                    dbname=self.dbname,
+                    user=self.user,
+                    password=self.password,
+                    host=self.host,
+                    port=self.port
+                )
+            except (Exception, psycopg2.DatabaseError) as error:
+                self.logger.log_error(error, f"Error connecting to {self.dbname} database", True)
 
     def disconnect(self):
-        if self.connection is not None:
-            self.connection.close()
-            self.logger.log_special("Database connection closed.")
+        with self._pool_lock:
+            if self.pool is not None:
+                self.pool.closeall()
+                self.pool = None
+                self._last_used.clear()
+                self.logger.log_special("Database connection pool closed.")
+
+    @contextmanager
+    def get_connection(self):
+        """
+        Checks a connection out of the pool for the calling thread. Nested calls on the same thread share the
+        connection, it goes back to the pool when the outermost block exits.
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        if self.pool is None:
+            self.connect()
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            self._local.connection = conn
+            self._local.depth = 1
+            yield conn
+        finally:
+            self._local.connection = None
+            if conn is not None:
+                self._checkin(conn)
+            self._slots.release()
+
+    def _checkout(self):
+        conn = self.pool.getconn()
+        if not self._is_healthy(conn):
+            self.logger.logger.warning("Replacing broken database connection")
+            self._discard(conn)
+            conn = self.pool.getconn()
+        conn.autocommit = True
+        return conn
+
+    def _checkin(self, conn):
+        if conn.closed or conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            self._discard(conn)
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        self.pool.putconn(conn)
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        self.pool.putconn(conn, close=True)
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < global_db_pool_health_check_seconds:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            if not conn.autocommit:
+                conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
 
     def insert_json_data(self, proc_name, jsonb_data):
         """
@@ -56,25 +203,78 @@ class DatabaseService:
         :param jsonb_data: A JSONB array of historical price data.
         """
         # self.logger.log_special(f"inserting data with proc: {proc_name}")
-        conn = self.connection
-        cursor = conn.cursor()
-        try:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+
+                # if not isinstance(jsonb_data, str):
+                #     logger.warning("converting jsonb_data to string")
+                #     jsonb_data = json.dumps(jsonb_data)
+                cursor.callproc(proc_name, jsonb_data)
+                conn.commit()
+                rows = cursor.fetchall()
+                cursor.close()
+                return rows
 
-            # if not isinstance(jsonb_data, str):
-            #     logger.warning("converting jsonb_data to string")
-            #     jsonb_data = json.dumps(jsonb_data)
-            cursor.callproc(proc_name, jsonb_data)
-            conn.commit()
-            rows = cursor.fetchall()
-            cursor.close()
-            return rows
-
-        except (Exception, psycopg2.DatabaseError) as error:
-            self.logger.log_error(error, f"Error inserting data: {error}", True)
-            conn.rollback()
-            if cursor:
+            except (Exception, psycopg2.DatabaseError) as error:
+                self.logger.log_error(error, f"Error inserting data: {error}", True)
+                conn.rollback()
+                if cursor:
+                    cursor.close()
+                raise error
+
+    def bulk_merge(self, table_name, columns, rows, key_columns, return_columns=None):
+        """
+        Streams rows into a temporary staging table with COPY and merges them into table_name in one transaction.
+        Rows whose key_columns already exist in table_name are left as they are.
+
+        :param table_name: Schema qualified target table.
+        :param columns: Column names, in the order of each row.
+        :param rows: Iterable of row tuples. Consumed lazily, None is loaded as NULL.
+        :param key_columns: Columns of the target's unique constraint, the merge fails when there is none.
+        :param return_columns: Target columns to return for every staged row, e.g. the id stored for a row that
+            already existed instead of the new id it was staged with. Holds one tuple per row in memory, so only
+            ask for it when the ids are needed.
+        :return: List of return_columns tuples, or the number of rows inserted when return_columns is None.
+        """
+        column_list = ', '.join(columns)
+        staging_table = f"staging_{table_name.replace('.', '_')}"
+        row_stream = CsvRowStream(rows)
+        start_time = time.perf_counter()
+
+        with self.get_connection() as conn:
+            autocommit = conn.autocommit
+            conn.autocommit = False
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"CREATE TEMP TABLE {staging_table} (LIKE {table_name} INCLUDING DEFAULTS) "
+                               f"ON COMMIT DROP;")
+                cursor.copy_expert(f"COPY {staging_table} ({column_list}) FROM STDIN WITH (FORMAT csv)", row_stream)
+                cursor.execute(f"INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM {staging_table} "
+                               f"ON CONFLICT ({', '.join(key_columns)}) DO NOTHING;")
+                inserted_rows = cursor.rowcount
+                merged = inserted_rows
+                if return_columns:
+                    join_condition = ' AND '.join(f"target.{column} = staged.{column}" for column in key_columns)
+                    cursor.execute(f"SELECT {', '.join(f'target.{column}' for column in return_columns)} "
+                                   f"FROM {staging_table} staged JOIN {table_name} target ON {join_condition};")
+                    merged = cursor.fetchall()
+                conn.commit()
+            except (Exception, psycopg2.DatabaseError) as error:
+                self.logger.log_error(error, f"Error bulk loading {table_name}", True)
+                if not conn.closed:
+                    conn.rollback()
+                raise error
+            finally:
                 cursor.close()
-            raise error
+                if not conn.closed:
+                    conn.autocommit = autocommit
+
+        elapsed_seconds = time.perf_counter() - start_time
+        rows_per_second = row_stream.row_count / elapsed_seconds if elapsed_seconds > 0 else 0
+        self.logger.logger.info(f"Copied {row_stream.row_count} rows into {table_name}, inserted {inserted_rows} "
+                                f"in {elapsed_seconds:.2f}s ({rows_per_second:,.0f} rows/s)")
+        return merged
 
     def execute_query(self, sql_query, args=None, return_objects=False, obj_class=None):
         """
@@ -85,20 +285,55 @@ class DatabaseService:
         :param return_objects: Whether to return objects of a specified class.
         :param obj_class: The class to use for object creation.
         """
-        conn = self.connection
-        cursor = conn.cursor()
-        try:
-            cursor.execute(sql_query, args)
-            if return_objects:
-                rows = cursor.fetchall()
-                return [obj_class(*row) for row in rows] if obj_class else rows
-            conn.commit()
-        except (Exception, psycopg2.DatabaseError) as error:
-            self.logger.log_error(error, "Error executing query", True)
-            conn.rollback()
-            raise error
-        finally:
-            cursor.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql_query, args)
+                if return_objects:
+                    rows = cursor.fetchall()
+                    return [obj_class(*row) for row in rows] if obj_class else rows
+                conn.commit()
+            except (Exception, psycopg2.DatabaseError) as error:
+                self.logger.log_error(error, "Error executing query", True)
+                if not conn.closed:
+                    conn.rollback()
+                raise error
+            finally:
+                cursor.close()
+
+    def stream_query(self, sql_query, args=None, itersize=global_db_stream_itersize, cursor_name=None):
+        """
+        Runs a query on a named server-side cursor and yields the result in chunks, so only itersize rows are held
+        in memory at once. The connection stays checked out until the generator is exhausted or closed.
+
+        :param sql_query: The SQL query to execute.
+        :param args: Arguments for the query.
+        :param itersize: Number of rows fetched from the server per round trip.
+        :param cursor_name: Name of the server-side cursor, must be unique per connection.
+        :return: Generator of row lists.
+        """
+        cursor_name = cursor_name or f"stream_{threading.get_ident()}_{time.monotonic_ns()}"
+        with self.get_connection() as conn:
+            # named cursors only live inside a transaction
+            autocommit = conn.autocommit
+            conn.autocommit = False
+            cursor = conn.cursor(name=cursor_name)
+            cursor.itersize = itersize
+            try:
+                cursor.execute(sql_query, args)
+                while True:
+                    rows = cursor.fetchmany(itersize)
+                    if not rows:
+                        break
+                    yield rows
+            except (Exception, psycopg2.DatabaseError) as error:
+                self.logger.log_error(error, "Error streaming query", True)
+                raise error
+            finally:
+                if not conn.closed:
+                    cursor.close()
+                    conn.rollback()
+                    conn.autocommit = autocommit
 
     def insert(self, proc_name, **args):
         """
@@ -118,20 +353,109 @@ class DatabaseService:
 
         return ret_val
 
-    def read(self, proc_name, obj_class=None, **args):
+    def read(self, proc_name, obj_class=None, columnar=False, **args):
         """
         Query data and create objects.
 
         :param proc_name: The name of the stored procedure to call.
         :param obj_class: The class to use for object creation.
+        :param columnar: Return a typed DataFrame decoded by read_frame instead of rows or objects.
         """
         sql_query = f"SELECT * FROM {proc_name}(%s::jsonb);"
         prepared_args = Json(args)
 
         # self.logger.logger.debug(f"getting data: {prepared_args}")
 
+        if columnar:
+            return self.read_frame(sql_query, (prepared_args,))
         return self.execute_query(sql_query, (prepared_args,), return_objects=True, obj_class=obj_class)
 
+    def read_columns(self, proc_name, positions, **args):
+        """
+        Like read, but only the result columns at positions are selected, inside the database, so wide columns such
+        as serialized models are never sent. Column names are looked up once per procedure.
+
+        :param proc_name: The name of the stored procedure to call.
+        :param positions: Positions of the wanted columns in the procedure's result.
+        :return: List of row tuples with the wanted columns in positions order.
+        """
+        sql_query = f"SELECT * FROM {proc_name}(%s::jsonb)"
+        prepared_args = Json(args)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                column_names = self._result_columns.get(proc_name)
+                if column_names is None:
+                    cursor.execute(f"{sql_query} LIMIT 0;", (prepared_args,))
+                    column_names = [column.name for column in cursor.description]
+                    self._result_columns[proc_name] = column_names
+                select_list = ', '.join('result."{}"'.format(column_names[position].replace('"', '""'))
+                                        for position in positions)
+                cursor.execute(f"SELECT {select_list} FROM ({sql_query}) AS result;", (prepared_args,))
+                rows = cursor.fetchall()
+                conn.commit()
+                return rows
+            except (Exception, psycopg2.DatabaseError) as error:
+                self.logger.log_error(error, f"Error reading columns of {proc_name}", True)
+                if not conn.closed:
+                    conn.rollback()
+                raise error
+            finally:
+                cursor.close()
+
+    def read_frame(self, sql_query, args=None):
+        """
+        Runs a query through COPY ... TO STDOUT and parses the CSV straight into a DataFrame, skipping per-row
+        tuples and objects. Column dtypes come from the result's type oids: integers, floats and booleans are typed
+        numpy columns, dates and timestamps are datetimes and everything else is left as strings.
+
+        :param sql_query: The SQL query to execute.
+        :param args: Arguments for the query.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                query = cursor.mogrify(sql_query, args).decode().rstrip().rstrip(';')
+                cursor.execute(f"SELECT * FROM ({query}) AS result LIMIT 0;")
+                description = cursor.description
+
+                csv_buffer = io.StringIO()
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", csv_buffer)
+                conn.commit()
+            except (Exception, psycopg2.DatabaseError) as error:
+                self.logger.log_error(error, "Error reading frame", True)
+                if not conn.closed:
+                    conn.rollback()
+                raise error
+            finally:
+                cursor.close()
+
+        column_names = [column.name for column in description]
+        dtypes = {column.name: pg_oid_dtypes.get(column.type_code, 'object') for column in description
+                  if column.type_code not in pg_oid_datetimes}
+        date_columns = [column.name for column in description if column.type_code in pg_oid_datetimes]
+
+        csv_buffer.seek(0)
+        result_df = pd.read_csv(csv_buffer, names=column_names, header=None, dtype=dtypes, keep_default_na=False,
+                                na_values=[''], true_values=['t'], false_values=['f'])
+        for column in date_columns:
+            result_df[column] = pd.to_datetime(result_df[column], utc=True, format='ISO8601')
+        return result_df
+
+    def stream_read(self, proc_name, order_by=None, itersize=global_db_stream_itersize, **args):
+        """
+        Streaming version of read, yields chunks of raw rows from a server-side cursor.
+
+        :param proc_name: The name of the stored procedure to call.
+        :param order_by: Optional ORDER BY expression applied to the procedure's result.
+        :param itersize: Number of rows fetched from the server per round trip.
+        """
+        sql_query = f"SELECT * FROM {proc_name}(%s::jsonb)"
+        if order_by:
+            sql_query += f" ORDER BY {order_by}"
+
+        return self.stream_query(f"{sql_query};", (Json(args),), itersize=itersize)
+
     # def get_model(self, model_name):
     #     """
     #     Fetches the latest version of a machine learning model by its name from the database.
@@ -279,5 +603,3 @@ class DatabaseService:
     #     cursor = conn.cursor()
     #     cursor.execute(query, values)
     #     conn.commit()
-
-
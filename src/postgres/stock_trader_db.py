@@ -3,10 +3,14 @@ import inspect
 import json
 import pickle
 
+from src.cache.lru_cache import TtlLruCache, cached, invalidates
+from src.constants import global_stock_prices_table, global_stock_prices_key_columns, global_db_stream_itersize, \
+    global_db_cache_max_size, global_db_cache_ttls, global_db_cache_invalidations
 from src.models.account_info.account import Account
 from src.models.stock.custom_time_frame import CustomTimeFrame
 from src.models.stock.filter import Filter
-from src.models.stock.stock_price import StockPrice
+from src.models.stock.stock_price import stock_price_columns, stock_price_record_columns
+from src.models.stock.stock_price_batch import StockPriceBatch
 from src.models.stock.stock_to_watch import StockToWatch
 from src.models.stock.ticker import Ticker
 from src.models.stock.watchlist_stock import WatchlistStock
@@ -25,11 +29,13 @@ class StockTraderDb:
     account_info_schema_name = "account_info"
 
     db_service = None
-    cache = {}
+    # shared by every instance, reference lookups are served from here until their ttl runs out
+    cache = TtlLruCache(max_size=global_db_cache_max_size)
 
     def __init__(self):
         self.db_service = DatabaseService()
 
+    @cached(ttl=global_db_cache_ttls['get_stock_filters'])
     def get_stock_filters(self, filter_codes=None):
         function_name = inspect.currentframe().f_code.co_name
         proc_name = f"{self.stock_schema_name}.{function_name}"
@@ -38,6 +44,7 @@ class StockTraderDb:
 
         return self.db_service.read(proc_name=proc_name, obj_class=Filter, filter_codes=values)
 
+    @cached(ttl=global_db_cache_ttls['get_timeframes'])
     def get_timeframes(self, timeframe_codes=None):
         function_name = inspect.currentframe().f_code.co_name
         proc_name = f"{self.stock_schema_name}.{function_name}"
@@ -46,12 +53,49 @@ class StockTraderDb:
 
         return self.db_service.read(proc_name=proc_name, obj_class=CustomTimeFrame, timeframe_codes=values)
 
-    def get_stock_prices(self, symbols=None, timeframe_unit='day', start_date=None, end_date=None):
+    def get_stock_prices(self, symbols=None, timeframe_unit='day', start_date=None, end_date=None, columnar=False):
+        """
+        :param columnar: Decode the result straight into typed columns instead of fetching row tuples.
+        :return: StockPriceBatch
+        """
         function_name = inspect.currentframe().f_code.co_name
         proc_name = f"{self.stock_schema_name}.{function_name}"
 
-        return self.db_service.read(proc_name=proc_name, obj_class=StockPrice, symbols=symbols,
+        if columnar:
+            stock_price_df = self.db_service.read(proc_name=proc_name, columnar=True, symbols=symbols,
+                                                  timeframe_unit=timeframe_unit, start_date=start_date,
+                                                  end_date=end_date)
+            return StockPriceBatch.from_frame(stock_price_df.set_axis(stock_price_record_columns, axis=1),
+                                              timeframe_unit)
+
+        rows = self.db_service.read(proc_name=proc_name, obj_class=None, symbols=symbols,
                                     timeframe_unit=timeframe_unit, start_date=start_date, end_date=end_date)
+        return StockPriceBatch.from_records(rows, timeframe_unit)
+
+    def stream_stock_prices(self, symbols=None, timeframe_unit='day', start_date=None, end_date=None,
+                            itersize=global_db_stream_itersize):
+        """
+        Streaming version of get_stock_prices over a server-side cursor. Rows are ordered by symbol and timestamp
+        and yielded as one StockPriceBatch per symbol, so memory is bounded by the largest symbol.
+
+        :param itersize: Number of rows fetched from the server per round trip.
+        :return: Generator of (symbol, StockPriceBatch).
+        """
+        proc_name = f"{self.stock_schema_name}.get_stock_prices"
+        # symbol and timestamp are the first and third columns returned by get_stock_prices
+        row_chunks = self.db_service.stream_read(proc_name=proc_name, order_by="1, 3", itersize=itersize,
+                                                 symbols=symbols, timeframe_unit=timeframe_unit,
+                                                 start_date=start_date, end_date=end_date)
+
+        symbol_rows = []
+        for rows in row_chunks:
+            for row in rows:
+                if symbol_rows and row[0] != symbol_rows[0][0]:
+                    yield symbol_rows[0][0], StockPriceBatch.from_records(symbol_rows, timeframe_unit)
+                    symbol_rows = []
+                symbol_rows.append(row)
+        if symbol_rows:
+            yield symbol_rows[0][0], StockPriceBatch.from_records(symbol_rows, timeframe_unit)
 
     def get_tickers(self, symbols=None):
         function_name = inspect.currentframe().f_code.co_name
@@ -75,18 +119,32 @@ class StockTraderDb:
 
         return self.db_service.read(proc_name=proc_name, obj_class=StockToWatch, filter_code=filter_code)
 
+    @cached(ttl=global_db_cache_ttls['get_watchlist'])
     def get_watchlist(self, symbol=None, date=None):
         function_name = inspect.currentframe().f_code.co_name
         proc_name = f"{self.stock_schema_name}.{function_name}"
 
         return self.db_service.read(proc_name=proc_name, obj_class=WatchlistStock, symbol=symbol, date=date)
 
+    @cached(ttl=global_db_cache_ttls['get_trade_signals'])
     def get_trade_signals(self):
         function_name = inspect.currentframe().f_code.co_name
         proc_name = f"{self.stock_schema_name}.{function_name}"
 
         return self.db_service.read(proc_name=proc_name, obj_class=TradeSignal)
 
+    def get_model_version(self, model_name):
+        """
+        Metadata only lookup of the latest model through the get_model procedure, without transferring the
+        serialized model.
+
+        :return: (id, model_version) of the latest version of model_name, or None when there is none.
+        """
+        proc_name = f"{self.machine_learning_schema_name}.get_model"
+        # same positions get_model reads the id and version from
+        rows = self.db_service.read_columns(proc_name, [1, 3], model_name=model_name)
+        return tuple(rows[0]) if rows else None
+
     def get_model(self, model_name=None):
         function_name = inspect.currentframe().f_code.co_name
         proc_name = f"{self.machine_learning_schema_name}.{function_name}"
@@ -96,7 +154,11 @@ class StockTraderDb:
             encoded_model = ml_model[0][0]
             decoded_model = base64.b64decode(encoded_model)
             model = pickle.loads(decoded_model)
-            return {'model': model, 'model_name': model_name, 'model_version': ml_model[0][3], 'id': ml_model[0][1]}
+            # models saved before the scaler was persisted are the bare estimator
+            bundle = model if isinstance(model, dict) else {'model': model}
+            return {'model': bundle['model'], 'scaler': bundle.get('scaler'),
+                    'feature_columns': bundle.get('feature_columns'), 'model_name': model_name,
+                    'model_version': ml_model[0][3], 'id': ml_model[0][1]}
         except Exception as e:
             return None
 
@@ -123,13 +185,24 @@ class StockTraderDb:
 
         return self.db_service.insert(proc_name, tickers=tickers)
 
-    def insert_stock_prices(self, stock_prices, proc_name=None):
+    def insert_stock_prices(self, stock_prices, proc_name=None, return_ids=False):
         """
-        Call the proc_name stored procedure.
+        Load stock prices. A StockPriceBatch is streamed in with COPY, a list of dictionaries goes through the
+        proc_name stored procedure. Bars that are already stored keep their row and id.
 
-        :param stock_prices: A JSONB array of stock price data.
+        :param stock_prices: A StockPriceBatch or a JSONB array of stock price data.
         :param proc_name: The name of the stored procedure to call.
+        :param return_ids: For a StockPriceBatch, return (id, symbol, timestamp) of every bar as stored instead of
+            the inserted row count, so bars loaded before report their existing id rather than the one in the batch.
+        :return: For a StockPriceBatch the inserted row count, or the stored ids with return_ids. Otherwise the rows
+            returned by the procedure.
         """
+        if isinstance(stock_prices, StockPriceBatch):
+            return self.db_service.bulk_merge(global_stock_prices_table, stock_price_columns,
+                                              stock_prices.iter_rows(),
+                                              key_columns=global_stock_prices_key_columns,
+                                              return_columns=['id', 'symbol', 'timestamp'] if return_ids else None)
+
         function_name = inspect.currentframe().f_code.co_name
         proc_name = f"{self.stock_schema_name}.{function_name}"
 
@@ -147,6 +220,7 @@ class StockTraderDb:
 
         return self.db_service.insert(proc_name, account_balances=account_balances)
 
+    @invalidates('get_watchlist')
     def insert_watchlist(self, watchlist):
         """
         Call the proc_name stored procedure.
@@ -228,7 +302,17 @@ class StockTraderDb:
 
         :param proc_name: The name of the stored procedure to call.
         """
-        return self.db_service.insert(proc_name, **args)
+        try:
+            return self.db_service.insert(proc_name, **args)
+        finally:
+            if proc_name in global_db_cache_invalidations:
+                self.cache.invalidate(*global_db_cache_invalidations[proc_name])
+
+    def get_cache_stats(self):
+        """
+        :return: Size, hit, miss and eviction counts of the reference data cache.
+        """
+        return self.cache.stats()
 
     def run_start(self, process_name):
         function_name = inspect.currentframe().f_code.co_name
@@ -270,8 +354,11 @@ class StockTraderDb:
         }
         self.db_service.insert(proc_name, log_data=data_to_insert)
 
-    def get_predictions_by_symbol(self, symbol):
+    def get_predictions_by_symbol(self, symbol, columnar=False):
+        """
+        :param columnar: Return a typed DataFrame instead of row tuples.
+        """
         function_name = inspect.currentframe().f_code.co_name
         proc_name = f"{self.machine_learning_schema_name}.{function_name}"
 
-        return self.db_service.read(proc_name=proc_name, obj_class=None, symbol=symbol)
+        return self.db_service.read(proc_name=proc_name, obj_class=None, columnar=columnar, symbol=symbol)
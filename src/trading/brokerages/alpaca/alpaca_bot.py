@@ -1,14 +1,9 @@
 # alpaca_bot.py
-import pandas as pd
 from alpaca.data import StockLatestQuoteRequest
 from alpaca.trading import MarketOrderRequest, OrderSide, TimeInForce, GetOrdersRequest, QueryOrderStatus
 
-from src.ml.data_cleaner import clean_stock_prices
-from src.ml.feature_engineer import engineer_features_for_stock_prices
-from src.ml.label_generator import LabelGenerator
-from src.ml.model_training import ModelTraining
 from src.models.trade.trading_bot import TradingBot
-from src.trading.brokerages.alpaca.alpaca_utils import convert_stock_price_list_to_df, calculate_stop_loss
+from src.trading.brokerages.alpaca.alpaca_utils import calculate_stop_loss
 from src.utils.stock_logger import StockLogger
 
 
@@ -24,6 +19,13 @@ class AlpacaBot(TradingBot):
         super().__init__()
         self.trading_client_api = alpaca_api.trading_client_api
 
+    def refresh(self):
+        """
+        Drops the cached account balance and positions so the next call reads them from alpaca again.
+        """
+        self.account_balance = None
+        self.open_positions = None
+
     def get_account_balance(self):
         if not self.account_balance:
             self.account_balance = self.trading_client_api.get_account().cash
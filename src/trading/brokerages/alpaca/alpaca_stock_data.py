@@ -1,20 +1,45 @@
 # alpaca_stock_data.py
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import pandas as pd
 from alpaca.data import TimeFrame, StockBarsRequest
+
+from src.cache.bar_cache import BarCache, bar_columns, to_epoch_ns, use_bar_cache
+from src.constants import global_symbols_per_bar_request, global_alpaca_requests_per_minute, \
+    global_alpaca_fetch_workers, global_alpaca_max_retries, global_alpaca_retry_backoff_seconds
 from src.trading.brokerages.alpaca.alpaca_utils import process_stock_data, prepare_symbols
+from src.utils.rate_limiter import TokenBucket
 from src.utils.stock_logger import StockLogger
-from src.utils.utils import validate_ticker_symbol
+from src.utils.utils import validate_ticker_symbol, chunk_array
 
 default_time = pd.Timestamp.now(tz="America/New_York").replace(hour=0, minute=0, second=0)
 
 
+# responses one bad ticker in a batch can cause, rate limit, auth and server errors fail every symbol alike
+symbol_error_status_codes = {400, 404, 422}
+
+
+def is_rate_limit_error(error):
+    return getattr(error, 'status_code', None) == 429
+
+
+def is_symbol_error(error):
+    return getattr(error, 'status_code', None) in symbol_error_status_codes
+
+
 class AlpacaStockData:
     logger = StockLogger("AlpacaStockData")
     brokerage_code = 'AL'
 
+    # shared by every fetch worker in the process so the pool as a whole stays under the per-minute quota
+    rate_limiter = TokenBucket(global_alpaca_requests_per_minute, period=60)
+    max_workers = global_alpaca_fetch_workers
+
     def __init__(self, alpaca_api):
         self.trading_client_api = alpaca_api.trading_client_api
         self.stock_historical_data_client = alpaca_api.stock_historical_data_client
+        self.bar_cache = BarCache() if use_bar_cache else None
 
     def get_stock_data(self, symbols, timeframe: TimeFrame, start_date, stock_filter=None, end_date=None):
         symbols = prepare_symbols(symbols)
@@ -22,42 +47,156 @@ class AlpacaStockData:
 
         stock_bars_dict = self._get_stock_bars_from_alpaca(symbols, timeframe, start_date, end_date)
         if not stock_bars_dict:
-            self.logger.logger.warning(f"No stock prices returned for {symbols}")
-            return []
+            self.logger.lazy.warning("No stock prices returned for {}", lambda: symbols)
 
         return process_stock_data(stock_bars_dict, timeframe.unit.value, stock_filter)
 
     def _get_stock_bars_from_alpaca(self, symbols, timeframe, start_date, end_date):
-        valid_symbols_data = {}
-        invalid_symbols = []
-        valid_stock_bars = []
+        """
+        Fetches bars for many symbols, packing up to global_symbols_per_bar_request symbols into each request.
+
+        :return: Dictionary of symbol to a DataFrame of that symbol's bars, indexed by (symbol, timestamp).
+        """
+        if self.bar_cache is not None:
+            valid_symbols_data = self._get_stock_bars_through_cache(symbols, timeframe, start_date, end_date)
+        else:
+            valid_symbols_data = {}
+            for symbol_bars in self.iter_stock_bars(symbols, timeframe, start_date, end_date):
+                valid_symbols_data.update({symbol: bars_df for symbol, bars_df in symbol_bars.items()
+                                           if not bars_df.empty})
+
+        if valid_symbols_data:
+            self.logger.logger.info(f"Successfully fetched stock bars for {len(valid_symbols_data)} valid symbols.")
+        else:
+            self.logger.logger.warning("No valid symbols found.")
+        return valid_symbols_data
+
+    def _get_stock_bars_through_cache(self, symbols, timeframe, start_date, end_date):
+        """
+        Serves bars from the local bar cache, fetching only the ranges it does not hold yet.
+
+        Symbols missing the same range (usually everything after the last run) are fetched together.
+        """
+        timeframe_key = timeframe.value
+        start_ns, end_ns = to_epoch_ns(start_date), to_epoch_ns(end_date)
+        symbols = [symbol for symbol in symbols if validate_ticker_symbol(symbol)]
+
+        symbols_by_gap = {}
+        for symbol in symbols:
+            for gap in self.bar_cache.missing_ranges(symbol, timeframe_key, start_ns, end_ns):
+                symbols_by_gap.setdefault(gap, []).append(symbol)
+
+        for (gap_start_ns, gap_end_ns), gap_symbols in symbols_by_gap.items():
+            # the api takes second resolution timestamps, bars never fall between whole seconds
+            gap_start = pd.Timestamp(gap_start_ns, tz='UTC').ceil('s')
+            gap_end = pd.Timestamp(gap_end_ns, tz='UTC').floor('s')
+            self.logger.debug_hot_path("Fetching {} symbols missing bars from {} to {}", len(gap_symbols), gap_start,
+                                       gap_end)
+            for symbol_bars in self.iter_stock_bars(gap_symbols, timeframe, gap_start, gap_end):
+                for symbol, bars_df in symbol_bars.items():
+                    self.bar_cache.write(symbol, timeframe_key, bars_df, gap_start_ns, gap_end_ns)
+
+        stock_bars = {}
+        for symbol in symbols:
+            bars_df = self.bar_cache.read(symbol, timeframe_key, start_ns, end_ns)
+            if bars_df is not None:
+                stock_bars[symbol] = bars_df
+        return stock_bars
+
+    def iter_stock_bars(self, symbols, timeframe, start_date, end_date):
+        """
+        Fetches bars on a bounded worker pool and yields each batch's per-symbol bars as soon as it completes.
 
+        :return: Generator of dictionaries of symbol to a DataFrame of that symbol's bars. Symbols that returned no
+            bars map to an empty DataFrame; symbols whose request failed are left out.
+        """
+        valid_symbols = []
         for symbol in symbols:
             if not validate_ticker_symbol(symbol):
                 self.logger.logger.warning(f"Invalid symbol: {symbol}")
-                invalid_symbols.append(symbol)
                 continue
+            valid_symbols.append(symbol)
+
+        symbol_batches = chunk_array(valid_symbols, global_symbols_per_bar_request)
+        if not symbol_batches:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(symbol_batches))) as executor:
+            futures = {executor.submit(self._get_stock_bars_with_fallback, symbol_batch, timeframe, start_date,
+                                       end_date): symbol_batch
+                       for symbol_batch in symbol_batches}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    # a failed batch is left out, the batches that did complete are still returned
+                    self.logger.log_error(e, f"Error getting stock bars for batch of {len(futures[future])} symbols "
+                                             f"starting with {futures[future][0]}", False)
+
+    def _get_stock_bars_with_fallback(self, symbols, timeframe, start_date, end_date):
+        """
+        Requests a batch, retrying it one symbol at a time only when the error can come from a bad ticker. Rate
+        limit, auth and other errors fail the whole batch, retrying them per symbol would only multiply the failing
+        requests, and iter_stock_bars leaves the batch out.
+        """
+        try:
+            return self._get_stock_bars_batch(symbols, timeframe, start_date, end_date)
+        except Exception as e:
+            if not is_symbol_error(e):
+                raise e
+            if len(symbols) == 1:
+                self.logger.log_error(e, f"Error getting stock bars for symbol {symbols[0]}", False)
+                return {}
+            # one bad ticker fails the whole request, so retry the batch one symbol at a time
+            self.logger.log_error(e, f"Error getting stock bars for batch of {len(symbols)} symbols, "
+                                     f"retrying individually", False)
+
+        symbol_bars = {}
+        for symbol in symbols:
             try:
-                stock_bars_request = StockBarsRequest(
-                    symbol_or_symbols=symbol,
-                    start=start_date,
-                    end=end_date,
-                    limit=1000000,
-                    timeframe=timeframe
-                )
-                stock_bars = self.stock_historical_data_client.get_stock_bars(stock_bars_request)
-                if stock_bars:
-                    valid_stock_bars.append(stock_bars)
-                    valid_symbols_data[symbol] = stock_bars
+                symbol_bars.update(self._get_stock_bars_batch([symbol], timeframe, start_date, end_date))
             except Exception as e:
+                if not is_symbol_error(e):
+                    raise e
                 self.logger.log_error(e, f"Error getting stock bars for symbol {symbol}", False)
-                invalid_symbols.append(symbol)
+        return symbol_bars
 
-        if valid_stock_bars:
-            self.logger.logger.info(f"Successfully fetched stock bars for {len(valid_stock_bars)} valid symbols.")
-        else:
-            self.logger.logger.warning("No valid symbols found.")
-        return valid_stock_bars
+    def _get_stock_bars_batch(self, symbols, timeframe, start_date, end_date):
+        """
+        Requests bars for a batch of symbols and splits the response back out per symbol.
+
+        The data client follows next_page_token until the request is exhausted, so the limit is left unset; a
+        limit on a multi-symbol request caps the total number of bars across all symbols, not per symbol.
+        """
+        stock_bars_request = StockBarsRequest(
+            symbol_or_symbols=symbols,
+            start=start_date,
+            end=end_date,
+            timeframe=timeframe
+        )
+        stock_bars = self._request_with_backoff(self.stock_historical_data_client.get_stock_bars, stock_bars_request)
+
+        symbol_bars = {symbol: pd.DataFrame(columns=bar_columns) for symbol in symbols}
+        if stock_bars and not stock_bars.df.empty:
+            symbol_bars.update({symbol: symbol_df
+                                for symbol, symbol_df in stock_bars.df.groupby(level='symbol', sort=False)})
+        return symbol_bars
+
+    def _request_with_backoff(self, request_function, request):
+        """
+        Calls the data api once a rate limiter token is available, backing off exponentially on 429 responses.
+        """
+        for attempt in range(global_alpaca_max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return request_function(request)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == global_alpaca_max_retries:
+                    raise e
+                self.rate_limiter.drain()
+                wait_seconds = global_alpaca_retry_backoff_seconds * (2 ** attempt)
+                self.logger.logger.warning(f"Rate limited by alpaca, retrying in {wait_seconds} seconds")
+                time.sleep(wait_seconds)
 
     def get_all_assets(self):
         return self.trading_client_api.get_all_assets()
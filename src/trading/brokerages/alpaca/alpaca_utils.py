@@ -3,7 +3,8 @@ import pandas as pd
 from src.ml.data_cleaner import clean_stock_prices
 from src.ml.feature_engineer import engineer_features_for_stock_prices
 from src.ml.label_generator import LabelGenerator
-from src.models.stock.stock_price import StockPrice
+from src.models.stock.indicator_registry import IndicatorPlan
+from src.models.stock.stock_price_batch import StockPriceBatch
 from src.utils.stock_logger import StockLogger
 from src.utils.utils import extract_symbols, convert_timestamp_format
 
@@ -44,30 +45,19 @@ def aggregate_stock_data(stock_prices):
 
 
 def process_stock_data(stock_price_data, timeframe_unit, stock_filter):
-    stock_prices = []
-    for stock in stock_price_data:
-        for index, bar in stock.df.iterrows():
-            stock_price = get_stock_price_from_bar(bar, index, stock_filter, timeframe_unit)
-            if stock_price:
-                stock_prices.append(stock_price)
-
-    return stock_prices
-
-
-def get_stock_price_from_bar(bar, index, stock_filter, timeframe_unit):
-    try:
-        symbol = index[0]
-        timestamp = str(index[1])
-
-        stock_price = StockPrice.from_alpaca_bar(symbol, bar, timeframe_unit, timestamp)
+    """
+    Converts alpaca bars for many symbols into a single StockPriceBatch.
 
-        if stock_filter is None or (
-                stock_filter.price_is_valid(stock_price.close) and stock_filter.volume_is_valid(
-            stock_price.volume)):
-            return stock_price
+    :param stock_price_data: Dictionary of symbol to a DataFrame of bars indexed by (symbol, timestamp).
+    :param timeframe_unit: Timeframe unit of the bars.
+    :param stock_filter: Optional Filter applied to close and volume.
+    :return: StockPriceBatch with one row per bar.
+    """
+    bar_frames = [bars_df for bars_df in stock_price_data.values() if not bars_df.empty]
+    if not bar_frames:
+        return StockPriceBatch.empty(timeframe_unit)
 
-    except Exception as e:
-        logger.log_error(e, f"Error getting stock price from bar: {e}", True)
+    return StockPriceBatch.from_bar_frame(pd.concat(bar_frames), timeframe_unit, stock_filter)
 
 
 def prepare_symbols(symbols):
@@ -79,6 +69,10 @@ def prepare_symbols(symbols):
 
 
 def convert_stock_price_list_to_df(stock_prices):
+    if isinstance(stock_prices, StockPriceBatch):
+        # one frame per symbol, most recent timestamp first
+        return stock_prices.to_frames(ascending=False)
+
     grouped_stock_prices = {}
     for sp in stock_prices:
         if sp.symbol not in grouped_stock_prices:
@@ -153,3 +147,44 @@ def fetch_and_prepare_data(indicators_to_use, stock_prices_list):
     # Generate labels
     labeled_stock_data = label_generator.generate_labels_for_stocks_prices(cleaned_stock_data_w_features)
     return labeled_stock_data
+
+
+def prepare_features(indicators_to_use, stock_prices_list):
+    """
+    Features for scoring the latest bar of each symbol, without labels: labeling drops the last look_forward rows,
+    which are exactly the rows a live prediction needs.
+
+    Each symbol's bars are put in time order and cut to the trailing bars the planned indicators need for their last
+    value, so a tick costs the same however long the fetched range is. A symbol whose newest bar does not survive
+    cleaning, e.g. because there is not enough history yet, gets an empty frame rather than an older row.
+
+    :return: List of per-symbol DataFrames, oldest bar first.
+    """
+    required_history = IndicatorPlan(indicators_to_use).required_history
+    stock_price_dataframes = []
+    for stock_price_df in convert_stock_price_list_to_df(stock_prices_list):
+        stock_price_df = stock_price_df.sort_values(by='timestamp')
+        if required_history is not None:
+            stock_price_df = stock_price_df.tail(max(required_history, 1))
+        stock_price_dataframes.append(stock_price_df)
+    newest_bars = [(df['symbol'].iloc[-1], df['timestamp'].iloc[-1]) if len(df) > 0 else (None, None)
+                   for df in stock_price_dataframes]
+
+    stock_data_with_features = clean_stock_prices(
+        engineer_features_for_stock_prices(stock_price_dataframes, indicators_to_use))
+    for position, (features_df, (symbol, newest_timestamp)) in enumerate(zip(stock_data_with_features, newest_bars)):
+        if len(features_df) > 0 and features_df['timestamp'].iloc[-1] == newest_timestamp:
+            continue
+        if newest_timestamp is not None:
+            logger.logger.warning(f"not scoring the {symbol} bar at {newest_timestamp}, its features are incomplete")
+        stock_data_with_features[position] = features_df.iloc[0:0]
+    return stock_data_with_features
+
+
+def prepare_data_by_symbol(indicators_to_use, symbol_batches):
+    """
+    Streaming version of fetch_and_prepare_data. Runs feature engineering and labeling one per-symbol
+    StockPriceBatch at a time and yields each labeled DataFrame, so only one symbol's frames are in memory.
+    """
+    for symbol_batch in symbol_batches:
+        yield from fetch_and_prepare_data(indicators_to_use, symbol_batch)
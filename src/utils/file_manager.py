@@ -1,7 +1,13 @@
 import json
 import os
+from contextlib import contextmanager
 from datetime import datetime
 
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
 timestamp = datetime.now().strftime("%Y-%m-%d__%H_%M_%S")
 script_dir = os.path.dirname(os.path.abspath(__file__))
 relative_dir = '../..'
@@ -45,3 +51,27 @@ def read_json_file(filename):
 def create_dir_if_not_exists(dir_path):
     if not os.path.exists(dir_path):
         os.makedirs(dir_path)
+
+
+@contextmanager
+def file_lock(lock_path):
+    """
+    Exclusive lock shared by every process on the machine, held for the with block. The lock file is created when
+    missing and left in place.
+    """
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'a+b') as lock_file:
+        if os.name == 'nt':
+            # locks the first byte, LK_LOCK retries for about 10 seconds before raising
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
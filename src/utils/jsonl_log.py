@@ -0,0 +1,174 @@
+import glob
+import json
+import os
+import time
+from datetime import datetime
+
+from src.constants import global_jsonl_log_max_bytes, global_jsonl_log_rotation
+from src.utils.file_manager import relative_path, create_dir_if_not_exists, read_json_file
+
+rotation_formats = {
+    None: None,
+    'daily': '%Y-%m-%d',
+    'monthly': '%Y-%m',
+}
+
+
+class JsonlSink:
+    """
+    Append-only JSON-Lines log file.
+
+    Every record is one json line written with a single os.write to a file opened with O_APPEND, so a write costs the
+    same no matter how long the log is, and lines from several processes interleave but never overwrite or split each
+    other. Files roll over by period, through a date in the file name, and by size, by renaming the full file aside.
+
+    :param directory: Directory under the repo root, e.g. logs/processes.
+    :param rotation: None, 'daily' or 'monthly'.
+    :param max_bytes: Size after which the current file is renamed aside, None to never rotate by size.
+    """
+
+    def __init__(self, directory, name, rotation=global_jsonl_log_rotation, max_bytes=global_jsonl_log_max_bytes):
+        if rotation not in rotation_formats:
+            raise ValueError(f"Unknown rotation: {rotation}")
+        self.directory = os.path.join(relative_path, directory)
+        self.name = name
+        self.rotation = rotation
+        self.max_bytes = max_bytes
+
+    def current_path(self, now=None):
+        period_format = rotation_formats[self.rotation]
+        if period_format is None:
+            return os.path.join(self.directory, f"{self.name}.jsonl")
+        return os.path.join(self.directory, f"{self.name}.{(now or datetime.now()).strftime(period_format)}.jsonl")
+
+    def append(self, record):
+        line = (json.dumps(record, default=str) + '\n').encode('utf-8')
+        path = self.current_path()
+        create_dir_if_not_exists(self.directory)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if self.max_bytes is not None and size >= self.max_bytes:
+            self._rotate(path)
+
+    @staticmethod
+    def _rotate(path):
+        try:
+            os.rename(path, f"{path[:-len('.jsonl')]}.{time.time_ns()}.jsonl")
+        except FileNotFoundError:
+            # another process rotated it first
+            pass
+
+    def paths(self):
+        """
+        :return: Every file of this log, rotated ones included, oldest first.
+        """
+        paths = glob.glob(os.path.join(glob.escape(self.directory), f"{glob.escape(self.name)}.*jsonl"))
+        return sorted(paths, key=os.path.getmtime)
+
+    def read(self):
+        """
+        Yields every record of this log, oldest file first. A line cut short by a crash is skipped.
+        """
+        for path in self.paths():
+            with open(path, 'r', encoding='utf-8') as log_file:
+                for line in log_file:
+                    try:
+                        yield json.loads(line)
+                    except json.decoder.JSONDecodeError:
+                        continue
+
+
+def process_sink(process_name):
+    return JsonlSink('logs/processes', process_name)
+
+
+def trade_sink(broker):
+    return JsonlSink('logs/trades', broker)
+
+
+def read_process_log(process_name):
+    """
+    :return: List of process runs with start_time and, for finished runs, end_time and duration (minutes). Runs
+        from the json files written before the jsonl logs are included first.
+    """
+    runs = list(read_json_file(f"logs/processes/{process_name}.json") or [])
+    for record in process_sink(process_name).read():
+        if record.get('event') == 'stop':
+            runs.append({key: value for key, value in record.items() if key not in ('event', 'process')})
+    return runs
+
+
+def last_process_start(process_name):
+    """
+    Start time of a run that was started, possibly by another process, and not yet stopped.
+
+    :return: start_time string of the newest start record when no stop record follows it, otherwise None.
+    """
+    # newest file first, the first file holding any start or stop record decides
+    for path in reversed(process_sink(process_name).paths()):
+        last_event = None
+        with open(path, 'r', encoding='utf-8') as log_file:
+            for line in log_file:
+                try:
+                    record = json.loads(line)
+                except json.decoder.JSONDecodeError:
+                    continue
+                if record.get('event') in ('start', 'stop'):
+                    last_event = record
+        if last_event is not None:
+            return last_event.get('start_time') if last_event['event'] == 'start' else None
+    return None
+
+
+def process_duration_summary(process_name):
+    """
+    :return: Dictionary with the number of finished runs and their mean, median, max and last duration in minutes.
+    """
+    durations = [run['duration (minutes)'] for run in read_process_log(process_name)
+                 if run.get('duration (minutes)') is not None]
+    if not durations:
+        return {'runs': 0}
+    ordered = sorted(durations)
+    middle = len(ordered) // 2
+    median = ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+    return {
+        'runs': len(durations),
+        'mean': sum(durations) / len(durations),
+        'median': median,
+        'max': ordered[-1],
+        'last': durations[-1],
+    }
+
+
+def read_trade_log(broker='alpaca'):
+    """
+    :return: List of logged trades, including those from the json file written before the jsonl logs.
+    """
+    return list(read_json_file(f"logs/trades/{broker}.json") or []) + list(trade_sink(broker).read())
+
+
+def trade_summary(broker='alpaca'):
+    """
+    :return: Dictionary of symbol to {action: {'trades', 'quantity', 'average_price'}}.
+    """
+    summary = {}
+    for trade in read_trade_log(broker):
+        totals = summary.setdefault(trade['symbol'], {}).setdefault(
+            trade['action'], {'trades': 0, 'quantity': 0.0, 'notional': 0.0, 'priced_quantity': 0.0})
+        quantity = float(trade.get('quantity') or 0)
+        totals['trades'] += 1
+        totals['quantity'] += quantity
+        if trade.get('price') is not None:
+            totals['notional'] += float(trade['price']) * quantity
+            totals['priced_quantity'] += quantity
+
+    for actions in summary.values():
+        for totals in actions.values():
+            priced_quantity = totals.pop('priced_quantity')
+            notional = totals.pop('notional')
+            totals['average_price'] = notional / priced_quantity if priced_quantity else None
+    return summary
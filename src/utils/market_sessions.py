@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from src.constants import global_market_calendar, global_market_sessions_cache_dir, \
+    global_market_sessions_years_back, global_market_sessions_years_ahead
+from src.utils.file_manager import relative_path, create_dir_if_not_exists
+from src.utils.stock_logger import StockLogger
+
+market_timezone = ZoneInfo('America/New_York')
+
+
+def _to_epoch_ns(value=None):
+    """
+    Converts a datetime, string or pandas Timestamp to UTC epoch nanoseconds, naive values are read as UTC.
+    None means now.
+    """
+    if value is None:
+        return time.time_ns()
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return int(timestamp.value)
+
+
+def _to_market_date(value=None):
+    """
+    :return: The exchange local date of value, a date is returned as is. None means today.
+    """
+    if value is None:
+        return datetime.now(market_timezone).date()
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return timestamp.tz_convert(market_timezone).date()
+
+
+class MarketSessionIndex:
+    """
+    Sorted arrays of every regular session's date, open and close for several years around today, built once from
+    the exchange calendar and cached as npz under global_market_sessions_cache_dir.
+
+    Lookups are binary searches over plain lists, so last session, N sessions back and is open answer in
+    microseconds without touching pandas_market_calendars. The index is rebuilt when today gets within 30 days of
+    either end.
+    """
+    logger = StockLogger("MarketSessionIndex")
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(MarketSessionIndex, cls).__new__(cls)
+                cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self, calendar=global_market_calendar, cache_dir=global_market_sessions_cache_dir):
+        if self._initialized:
+            return
+        self._initialized = True
+        self.calendar = calendar
+        self.cache_path = os.path.join(relative_path, cache_dir, f"{calendar}.npz")
+        self._lock = threading.Lock()
+        self.dates = []
+        self.opens_ns = []
+        self.closes_ns = []
+        self._load_or_build()
+
+    def _covers(self, dates, today):
+        margin = timedelta(days=30)
+        return len(dates) > 0 and dates[0] <= today - margin and today + margin <= dates[-1]
+
+    def _load_or_build(self):
+        today = _to_market_date()
+        with self._lock:
+            if self._covers(self.dates, today):
+                return
+            arrays = self._load()
+            if arrays is None or not self._covers([date.fromordinal(int(day)) for day in arrays['dates'][[0, -1]]],
+                                                  today):
+                arrays = self._build(today)
+                self._save(arrays)
+            self.dates = [date.fromordinal(int(day)) for day in arrays['dates']]
+            self.opens_ns = arrays['opens_ns'].tolist()
+            self.closes_ns = arrays['closes_ns'].tolist()
+
+    def _load(self):
+        try:
+            with np.load(self.cache_path) as arrays:
+                if str(arrays['calendar']) != self.calendar or len(arrays['dates']) == 0:
+                    return None
+                return {name: arrays[name] for name in ['dates', 'opens_ns', 'closes_ns']}
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return None
+
+    def _build(self, today):
+        # the calendar package is slow to import, it is only needed when the cached index is missing or stale
+        import pandas_market_calendars as mcal
+
+        start_date = today - timedelta(days=365 * global_market_sessions_years_back)
+        end_date = today + timedelta(days=365 * global_market_sessions_years_ahead)
+        schedule = mcal.get_calendar(self.calendar).schedule(start_date=start_date, end_date=end_date)
+        self.logger.logger.debug(f"built {self.calendar} index of {len(schedule)} sessions {start_date} to {end_date}")
+        return {
+            'dates': np.array([day.toordinal() for day in schedule.index.date], dtype='int64'),
+            'opens_ns': pd.DatetimeIndex(schedule['market_open']).as_unit('ns').asi8,
+            'closes_ns': pd.DatetimeIndex(schedule['market_close']).as_unit('ns').asi8,
+        }
+
+    def _save(self, arrays):
+        try:
+            create_dir_if_not_exists(os.path.dirname(self.cache_path))
+            temp_path = f"{self.cache_path}.{os.getpid()}.tmp.npz"
+            np.savez(temp_path, calendar=np.array(self.calendar), **arrays)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            self.logger.log_error(e, f"Error caching market sessions to {self.cache_path}", False)
+
+    def last_session(self, day=None):
+        """
+        :param day: Date, or timestamp read in exchange local time, defaults to today.
+        :return: Date of the latest session on or before day, or None when day is before the index.
+        """
+        self._load_or_build()
+        position = bisect_right(self.dates, _to_market_date(day)) - 1
+        return self.dates[position] if position >= 0 else None
+
+    def sessions_back(self, sessions, day=None):
+        """
+        :return: Date of the session that many sessions before the last session on or before day.
+        """
+        self._load_or_build()
+        position = bisect_right(self.dates, _to_market_date(day)) - 1 - sessions
+        return self.dates[position] if 0 <= position < len(self.dates) else None
+
+    def sessions_between(self, start_date, end_date):
+        """
+        :return: Dates of every session from start_date to end_date, both included.
+        """
+        self._load_or_build()
+        return self.dates[bisect_left(self.dates, _to_market_date(start_date)):
+                          bisect_right(self.dates, _to_market_date(end_date))]
+
+    def is_session(self, day=None):
+        """
+        :return: Whether the exchange has a regular session on day, open or not at the moment.
+        """
+        self._load_or_build()
+        day = _to_market_date(day)
+        position = bisect_left(self.dates, day)
+        return position < len(self.dates) and self.dates[position] == day
+
+    def is_open(self, now=None):
+        """
+        :return: Whether a regular session is in progress at now, defaults to the current time.
+        """
+        self._load_or_build()
+        now_ns = _to_epoch_ns(now)
+        position = bisect_right(self.opens_ns, now_ns) - 1
+        return position >= 0 and now_ns < self.closes_ns[position]
+
+    def current_or_next_session(self, now=None):
+        """
+        :return: (market_open, market_close) as UTC Timestamps of the session open at now or the next one to open,
+            or None past the end of the index.
+        """
+        self._load_or_build()
+        position = bisect_right(self.closes_ns, _to_epoch_ns(now))
+        if position >= len(self.closes_ns):
+            return None
+        return (pd.Timestamp(self.opens_ns[position], tz='UTC'),
+                pd.Timestamp(self.closes_ns[position], tz='UTC'))
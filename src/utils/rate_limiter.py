@@ -0,0 +1,47 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to keep a pool of workers under an API's request quota.
+
+    :param rate: Tokens added per period.
+    :param period: Length of the refill period in seconds.
+    :param capacity: Maximum number of tokens that can be banked. Defaults to rate.
+    """
+
+    def __init__(self, rate, period=60.0, capacity=None):
+        self.rate = float(rate)
+        self.period = float(period)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate / self.period)
+        self.updated_at = now
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until the requested number of tokens is available, then takes them.
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_seconds = (tokens - self.tokens) * self.period / self.rate
+            time.sleep(wait_seconds)
+
+    def drain(self):
+        """
+        Empties the bucket, e.g. after the server answers 429, so every worker backs off together.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = 0
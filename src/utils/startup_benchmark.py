@@ -0,0 +1,48 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from src.batch_jobs.batch_jobs_maps import global_batch_job_map
+from src.utils.file_manager import relative_path
+
+# runs in a fresh interpreter, like a cold start: imports the runner and resolves one job's class
+startup_code = """
+import time
+start_time = time.perf_counter()
+from src.batch_jobs.batch_runner import BatchRunner
+from src.batch_jobs.batch_jobs_maps import get_batch_job_class
+get_batch_job_class({run_action!r})
+print(time.perf_counter() - start_time)
+"""
+
+
+def measure_startup(run_action, repeats=5):
+    """
+    :return: Seconds spent importing BatchRunner and the job for run_action, one value per fresh interpreter.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(relative_path))
+    timings = []
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, '-c', startup_code.format(run_action=run_action)],
+                                   cwd=os.path.abspath(relative_path), env=env, capture_output=True, text=True,
+                                   check=True)
+        timings.append(float(completed.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start import time of BatchRunner per job")
+    parser.add_argument('--run_action', action='append', help='Job to measure, repeatable, defaults to every job')
+    parser.add_argument('--repeats', type=int, default=5, help='Fresh interpreters per job')
+    args = parser.parse_args()
+
+    print(f"{'run_action':<24}{'median (s)':>12}{'min (s)':>12}{'max (s)':>12}")
+    for run_action in args.run_action or list(global_batch_job_map):
+        timings = measure_startup(run_action, args.repeats)
+        print(f"{run_action:<24}{statistics.median(timings):>12.3f}{min(timings):>12.3f}{max(timings):>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
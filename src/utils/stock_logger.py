@@ -1,69 +1,104 @@
+import os
 import sys
 import traceback
 from datetime import datetime
 
 from loguru import logger
 
-from src.utils.file_manager import write_json_file, read_json_file
+from src.constants import global_log_level, global_hot_path_debug
+from src.utils.jsonl_log import process_sink, trade_sink, last_process_start
 
 log_format = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{extra[logger_name]}: {line}</cyan> | <level>{message}</level>"
+log_level = os.environ.get('STOCK_TRADER_LOG_LEVEL', global_log_level).upper()
+hot_path_debug = os.environ.get('STOCK_TRADER_HOT_PATH_DEBUG', str(global_hot_path_debug)).lower() in ('1', 'true',
+                                                                                                     'yes')
+
 logger.remove()
-logger.add('logs/app.log', level="ERROR", rotation="1 week", compression="zip", serialize=True)
-logger.add(sys.stdout, format=log_format, level='DEBUG')
+# enqueue hands records to a background thread, so callers never block on the file or the console
+logger.add('logs/app.log', level="ERROR", rotation="1 week", compression="zip", serialize=True, enqueue=True)
+logger.add(sys.stdout, format=log_format, level=log_level, enqueue=True)
+
+# decided once at import, a disabled debug_hot_path call is a single boolean check
+hot_path_enabled = hot_path_debug and logger.level(log_level).no <= logger.level('DEBUG').no
 
 
 class StockLogger:
+    # process_name -> start time of the runs this process has started and not yet stopped
+    _process_starts = {}
+
     def __init__(self, logger_name="CustomLogger"):
         self.logger_name = logger_name
         self.logger = logger.bind(logger_name=self.logger_name)
         self.logger.level('DEBUG', color="<blue>")
         self.logger.level('INFO', color="<white>")
 
+    @property
+    def lazy(self):
+        """
+        Logger whose message arguments may be zero-argument callables, only called when the record is emitted, e.g.
+        self.logger.lazy.debug("rows: {}", lambda: len(df)).
+        """
+        return self.logger.opt(lazy=True)
+
+    def debug_hot_path(self, message, *args):
+        """
+        Debug message for per-row, per-symbol and per-tick code. A no-op when hot path debug logging is switched off
+        or the level is above DEBUG; otherwise formatted lazily like lazy.
+
+        :param message: Message with {} placeholders.
+        :param args: Values or zero-argument callables for the placeholders.
+        """
+        if hot_path_enabled:
+            # lazy=True calls every argument, so plain values are wrapped to return themselves
+            args = [arg if callable(arg) else (lambda value=arg: value) for arg in args]
+            self.logger.opt(lazy=True, depth=1).debug(message, *args)
+
     def log_process(self, process_name: str, action='start' or 'stop' or 1 or 0):
         date_format = "%Y-%m-%d %H:%M:%S"
         # Get the current date and time
         current_time = datetime.now()
 
-        log_file = f"logs/processes/{process_name}.json"
-
-        # Load existing entries from the file, or create an empty list if the file doesn't exist
-        logs = read_json_file(log_file)
-        if logs is None:
-            logs = []
+        # one appended line per event, the start time is kept in memory for the stop line and read back from the start
+        # line when the run was started by another process or before a restart
+        sink = process_sink(process_name)
 
         if action == 'start' or action == 1:
+            self._process_starts[process_name] = current_time
             new_log = {
+                "event": "start",
+                "process": process_name,
+                "pid": os.getpid(),
                 "start_time": current_time.strftime(date_format)
             }
             self.logger.info(f"Started {process_name} at: {new_log['start_time']}")
-            logs.append(new_log)
+            sink.append(new_log)
 
         elif action == 'stop' or action == 0:
-            log = logs[-1]
-            start_time = datetime.strptime(log['start_time'], date_format)
-            log['end_time'] = current_time.strftime(date_format)
-
-            # Calculate the duration in minutes
-            duration_minutes = (current_time - start_time).total_seconds() / 60
-            log['duration (minutes)'] = duration_minutes
+            start_time = self._process_starts.pop(process_name, None)
+            if start_time is None:
+                logged_start = last_process_start(process_name)
+                start_time = datetime.strptime(logged_start, date_format) if logged_start else None
+            if start_time is None:
+                self.logger.warning(f"No start logged for {process_name}, stopping it without a duration")
+            log = {
+                "event": "stop",
+                "process": process_name,
+                "pid": os.getpid(),
+                "start_time": start_time.strftime(date_format) if start_time else None,
+                "end_time": current_time.strftime(date_format),
+                # Calculate the duration in minutes
+                "duration (minutes)": (current_time - start_time).total_seconds() / 60 if start_time else None
+            }
 
             self.logger.info(
                 f"Stopped {process_name} at: {log['end_time']}, duration (minutes): {log['duration (minutes)']}")
-
-        write_json_file(log_file, logs, False)
+            sink.append(log)
 
     def log_trade(self, symbol: str, action="buy" or "sell", price: float = None, quantity: float = None,
                   broker="alpaca"):
         # Get the current date and time
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        log_file = f"logs/trades/{broker}.json"
-
-        # Load existing entries from the file, or create an empty list if the file doesn't exist
-        logs = read_json_file(log_file)
-        if logs is None:
-            logs = []
-
         new_log = {
             "symbol": symbol,
             "action": action,
@@ -74,10 +109,7 @@ class StockLogger:
 
         self.logger.info(f"Logged trade: {new_log}")
 
-        # Append the new entry to the list
-        logs.append(new_log)
-
-        write_json_file(log_file, logs, False)
+        trade_sink(broker).append(new_log)
 
     def log_error(self, error, msg, log_stack_trace=True):
         self.logger.error(f"{msg}: {error}")
@@ -0,0 +1,43 @@
+from collections import deque
+
+import numpy as np
+
+
+class TickMetrics:
+    """
+    Durations of the most recent scheduler ticks, summarized for logging.
+
+    :param window: Number of recent ticks the percentiles are computed over.
+    :param interval_seconds: Tick interval, ticks longer than this are counted as overruns.
+    """
+
+    def __init__(self, window, interval_seconds):
+        self.durations = deque(maxlen=window)
+        self.interval_seconds = interval_seconds
+        self.ticks = 0
+        self.failures = 0
+        self.overruns = 0
+
+    def record(self, duration_seconds, success=True):
+        self.durations.append(duration_seconds)
+        self.ticks += 1
+        if not success:
+            self.failures += 1
+        if duration_seconds > self.interval_seconds:
+            self.overruns += 1
+
+    def summary(self):
+        """
+        :return: Dictionary of tick counts and last, mean, p50, p95 and max duration in seconds over the window.
+        """
+        summary = {'ticks': self.ticks, 'failures': self.failures, 'overruns': self.overruns}
+        if self.durations:
+            durations = np.fromiter(self.durations, dtype='float64')
+            summary.update({
+                'last': round(float(durations[-1]), 3),
+                'mean': round(float(durations.mean()), 3),
+                'p50': round(float(np.percentile(durations, 50)), 3),
+                'p95': round(float(np.percentile(durations, 95)), 3),
+                'max': round(float(durations.max()), 3),
+            })
+        return summary
@@ -1,12 +1,10 @@
 import inspect
 import json
+import os
 import re
 import uuid
 from datetime import datetime, timedelta
 
-import pandas as pd
-import pandas_market_calendars as mcal
-
 from src.constants import global_days_to_get
 from src.utils.stock_logger import StockLogger
 
@@ -16,6 +14,49 @@ def get_uuid_as_str():
     return new_uuid
 
 
+def get_uuids_as_str(count):
+    """
+    Vectorized get_uuid_as_str: builds count random version 4 uuid strings without a Python call per uuid.
+
+    :param count: Number of uuids to generate.
+    :return: Object array of uuid strings.
+    """
+    # numpy and pandas are imported where they are used, jobs that only need the plain helpers skip loading them
+    import numpy as np
+
+    raw = np.frombuffer(os.urandom(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+
+    hex_chars = np.frombuffer(raw.tobytes().hex().encode('ascii'), dtype=np.uint8).reshape(count, 32)
+    uuid_chars = np.full((count, 36), ord('-'), dtype=np.uint8)
+    uuid_chars[:, 0:8] = hex_chars[:, 0:8]
+    uuid_chars[:, 9:13] = hex_chars[:, 8:12]
+    uuid_chars[:, 14:18] = hex_chars[:, 12:16]
+    uuid_chars[:, 19:23] = hex_chars[:, 16:20]
+    uuid_chars[:, 24:36] = hex_chars[:, 20:32]
+    return uuid_chars.view('S36').ravel().astype('U36').astype(object)
+
+
+def format_utc_timestamps(epoch_ns):
+    """
+    Vectorized str() of UTC timestamps, e.g. '2024-01-02 14:30:00+00:00'.
+
+    :param epoch_ns: Array of UTC epoch nanoseconds.
+    :return: Object array of timestamp strings.
+    """
+    import numpy as np
+
+    epoch_seconds = np.asarray(epoch_ns, dtype='int64').view('datetime64[ns]').astype('datetime64[s]')
+    date_chars = np.datetime_as_string(epoch_seconds, unit='s').astype('S19').view(np.uint8).reshape(-1, 19)
+
+    timestamp_chars = np.empty((len(date_chars), 25), dtype=np.uint8)
+    timestamp_chars[:, :19] = date_chars
+    timestamp_chars[:, 10] = ord(' ')
+    timestamp_chars[:, 19:] = np.frombuffer(b'+00:00', dtype=np.uint8)
+    return timestamp_chars.view('S25').ravel().astype('U25').astype(object)
+
+
 def get_datetime_as_str():
     return str(datetime.now())
 
@@ -94,33 +135,41 @@ def generate_date_range(days_back=global_days_to_get, end_date=None):
     Returns:
     tuple: A tuple containing the start and end dates.
     """
-    timezone = "America/New_York"
+    import pandas as pd
+    from src.utils.market_sessions import MarketSessionIndex
 
-    nyse_cal = mcal.get_calendar('XNYS')
+    timezone = "America/New_York"
 
     if end_date is None:
         # Use the current date and time in the New York timezone
         current_datetime = pd.Timestamp.now(tz=timezone)
+        today = current_datetime.date()
 
         # Check if the market is open on the current date
-        if nyse_cal.valid_days(start_date=current_datetime, end_date=current_datetime, tz=timezone).size > 0:
+        last_session = MarketSessionIndex().last_session(today)
+        if last_session == today:
             # Market is open today, use the current date as end_date
             end_date = current_datetime.replace(hour=0, minute=0, second=0)
         else:
             # Market is closed today, use the last valid market day as end_date
-            end_date = find_previous_valid_market_day(nyse_cal, current_datetime, timezone).replace(hour=0, minute=0,
-                                                                                                    second=0)
+            end_date = (current_datetime - timedelta(days=(today - last_session).days)).replace(hour=0, minute=0,
+                                                                                               second=0)
             print(f"Market is closed today, using {end_date} as end_date")
 
     start_date = end_date - timedelta(days=days_back)
     return start_date, end_date
 
 
-def find_previous_valid_market_day(calendar, current_datetime, timezone):
-    while True:
-        current_datetime -= timedelta(days=1)
-        if calendar.valid_days(start_date=current_datetime, end_date=current_datetime, tz=timezone).size > 0:
-            return current_datetime
+def get_market_session(now=None):
+    """
+    Regular NYSE session that is open at now, or the next one to open.
+
+    :param now: tz-aware timestamp, defaults to the current time.
+    :return: (market_open, market_close) as UTC Timestamps, or None past the end of the session index.
+    """
+    from src.utils.market_sessions import MarketSessionIndex
+
+    return MarketSessionIndex().current_or_next_session(now)
 
 
 # Function to adjust for market holidays
@@ -135,9 +184,10 @@ def adjust_for_market_holidays(start_date, end_date):
     Returns:
     tuple: A tuple containing the adjusted start and end dates.
     """
-    nyse = mcal.get_calendar('NYSE')
-    valid_days = nyse.valid_days(start_date=start_date, end_date=end_date)
-    return valid_days.min().date(), valid_days.max().date()
+    from src.utils.market_sessions import MarketSessionIndex
+
+    valid_days = MarketSessionIndex().sessions_between(start_date, end_date)
+    return valid_days[0], valid_days[-1]
 
 
 # Function to validate ticker symbols